@@ -46,6 +46,7 @@ width_factor = mparam.width_factor
 height_factor = mparam.height_factor
 time_factor = mparam.time_factor
 num_trials = mparam.num_trials
+simulation_engine = mparam.simulation_engine
 #
 mfunc.show_message(g, analysis_handle, "\n\nCompare Generations\n\n")
 #
@@ -62,7 +63,9 @@ mfunc.show_message(g, analysis_handle, "height_factor = " + \
 mfunc.show_message(g, analysis_handle, "time_factor = " + \
   str(time_factor) + "\n")
 mfunc.show_message(g, analysis_handle, "num_trials = " + \
-  str(num_trials) + "\n\n")
+  str(num_trials) + "\n")
+mfunc.show_message(g, analysis_handle, "simulation_engine = " + \
+  str(simulation_engine) + "\n\n")
 mfunc.show_message(g, analysis_handle, "path = " + \
   str(pickle_dir) + "\n\n")
 #
@@ -117,7 +120,8 @@ for i in range(0, final_num + 1, step_size):
     for sx in x_sample:
       for sz in z_sample:
         [scorex, scorez] = mfunc.score_pair(g, sx, sz, \
-          width_factor, height_factor, time_factor, num_trials)
+          width_factor, height_factor, time_factor, num_trials, \
+          simulation_engine)
         total_fitness = total_fitness + scorex
         total_sample_size = total_sample_size + 1
     # calculate average fitness for the run
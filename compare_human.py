@@ -53,6 +53,12 @@ max_area = 50000
 #
 num_trials = 20
 #
+# the engine that plays the Immigration Game (see model_parameters)
+# - the designed patterns make big toroids that are mostly empty, so
+#   "sparse" or "auto" are good choices here
+#
+simulation_engine = mparam.simulation_engine
+#
 # a pattern for matching the last generation of pickles
 #
 last_generation = "*-pickle-100.bin"
@@ -78,6 +84,7 @@ text_file.write("\n\nDesigned Seeds versus Evolved Seeds\n\n" + \
   "height_factor = " + str(height_factor) + "\n" + \
   "time_factor = " + str(time_factor) + "\n" + \
   "num_trials = " + str(num_trials) + "\n" + \
+  "simulation_engine = " + str(simulation_engine) + "\n" + \
   "last_generation = " + last_generation + "\n" + \
   "max_area = " + str(max_area) + "\n\n")
 #
@@ -142,7 +149,7 @@ for dir_name, subdir_list, file_list in os.walk(pattern_dir):
       for evolved_seed in evolved_seeds:
         [designed_score, evolved_score] = mfunc.score_pair(g, \
           designed_seed, evolved_seed, width_factor, height_factor, \
-          time_factor, num_trials)
+          time_factor, num_trials, simulation_engine)
         total_designed_score = total_designed_score + designed_score
         total_evolved_score = total_evolved_score + evolved_score
       # write out the score for the analysis report file
@@ -46,6 +46,7 @@ width_factor = mparam.width_factor
 height_factor = mparam.height_factor
 time_factor = mparam.time_factor
 num_trials = mparam.num_trials
+simulation_engine = mparam.simulation_engine
 #
 mfunc.show_message(g, analysis_handle, "\n\nCompare Random\n\n")
 #
@@ -62,7 +63,9 @@ mfunc.show_message(g, analysis_handle, "height_factor = " + \
 mfunc.show_message(g, analysis_handle, "time_factor = " + \
   str(time_factor) + "\n")
 mfunc.show_message(g, analysis_handle, "num_trials = " + \
-  str(num_trials) + "\n\n")
+  str(num_trials) + "\n")
+mfunc.show_message(g, analysis_handle, "simulation_engine = " + \
+  str(simulation_engine) + "\n\n")
 mfunc.show_message(g, analysis_handle, "path = " + \
   str(pickle_dir) + "\n\n")
 #
@@ -112,7 +115,8 @@ for i in range(0, final_num + 1, step_size):
         random_seed = evolved_seed.shuffle()
         # compare the evolved seed to the random seed
         [random_score, evolved_score] = mfunc.score_pair(g, random_seed, \
-          evolved_seed, width_factor, height_factor, time_factor, num_trials)
+          evolved_seed, width_factor, height_factor, time_factor, num_trials, \
+          simulation_engine)
         total_fitness = total_fitness + evolved_score
         total_sample_size = total_sample_size + 1
     # calculate average fitness for the run
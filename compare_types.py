@@ -116,6 +116,7 @@ width_factor = mparam.width_factor
 height_factor = mparam.height_factor
 time_factor = mparam.time_factor
 num_trials = mparam.num_trials
+simulation_engine = mparam.simulation_engine
 #
 mfunc.show_message(g, analysis_handle, \
   "\n\nCompare Types\n\n")
@@ -139,7 +140,9 @@ mfunc.show_message(g, analysis_handle, "height_factor = " + \
 mfunc.show_message(g, analysis_handle, "time_factor = " + \
   str(time_factor) + "\n")
 mfunc.show_message(g, analysis_handle, "num_trials = " + \
-  str(num_trials) + "\n\n")
+  str(num_trials) + "\n")
+mfunc.show_message(g, analysis_handle, "simulation_engine = " + \
+  str(simulation_engine) + "\n\n")
 #
 mfunc.show_message(g, analysis_handle, \
   "Note that the numbers will change slightly each time this \n" + \
@@ -188,7 +191,8 @@ for i in range(0, final_num + 1, step_size):
         # for each seed in x2_sample ...
         for s2 in x2_sample:
           [score1, score2] = mfunc.score_pair(g, s1, s2, \
-            width_factor, height_factor, time_factor, num_trials)
+            width_factor, height_factor, time_factor, num_trials, \
+            simulation_engine)
           total_fitness = total_fitness + score2
           total_sample_size = total_sample_size + 1
   #
@@ -3,11 +3,64 @@ Model Classes
 
 Peter Turney, July 5, 2019
 """
-import golly as g
 import model_parameters as mparam
 import random as rand
 import numpy as np
 import copy
+#
+# cell_list(cells, g_xstart, g_ystart) -- returns cell_list
+#
+def cell_list(cells, g_xstart, g_ystart):
+  """
+  Make a Golly multi-state cell list [x1, y1, state1, x2, y2, state2,
+  ...] for a matrix of cells [x][y], with cell [0][0] at (g_xstart,
+  g_ystart). Cells in state 0 are included, so that g.putcells() in
+  "copy" mode writes the whole matrix, like a loop of g.setcell().
+  Golly wants multi-state lists to have an odd length, so a 0 is
+  appended when the length would be even.
+  """
+  [xspan, yspan] = cells.shape
+  [xs, ys] = np.indices((xspan, yspan))
+  triples = np.stack([xs.ravel() + g_xstart, ys.ravel() + g_ystart, \
+    np.asarray(cells).ravel()], axis=1)
+  cell_list = [int(a) for a in triples.ravel()]
+  if (len(cell_list) % 2 == 0):
+    cell_list.append(0)
+  return cell_list
+#
+# the number of ones in each byte from 0 to 255
+#
+popcount_table = np.array([bin(i).count("1") for i in range(256)], \
+  dtype=np.uint8)
+#
+# is_binary(cells) -- returns True or False
+#
+def is_binary(cells):
+  """
+  Check whether all the cells in a matrix are 0s and 1s.
+  """
+  return bool(np.all((cells == 0) | (cells == 1)))
+#
+# pack_cells(cells) -- returns packed
+#
+def pack_cells(cells):
+  """
+  Pack a matrix of 0s and 1s [x][y] into bits: each row x becomes
+  (yspan + 7) / 8 bytes (np.uint8), padded at the end with 0s. Rows
+  of the packed matrix are rows of the seed, so they can be sliced
+  as usual, and unpack_cells() gives back the original matrix.
+  """
+  assert is_binary(cells)
+  return np.packbits(np.asarray(cells, dtype=np.uint8), axis=1)
+#
+# unpack_cells(packed, yspan) -- returns cells
+#
+def unpack_cells(packed, yspan):
+  """
+  Unpack the bits made by pack_cells() into a matrix of 0s and 1s
+  [x][y], with yspan columns.
+  """
+  return np.unpackbits(packed, axis=1)[:, :yspan].astype(np.int)
 """
 Make a class for seeds.
 """
@@ -46,6 +99,46 @@ class Seed:
     # position of seed in the population array, to be modified later
     self.address = 0 
   #
+  # __getstate__(self) -- returns state
+  #
+  def __getstate__(self):
+    """
+    Pickle a seed of 0s and 1s with its cells packed into bits (see
+    pack_cells()), which is much smaller than an array of integers.
+    Seeds with other states (see red2blue()) are pickled as they are.
+    """
+    state = self.__dict__.copy()
+    if is_binary(self.cells):
+      del state["cells"]
+      state["packed_cells"] = [pack_cells(self.cells), self.cells.shape[1]]
+    return state
+  #
+  # __setstate__(self, state) -- returns NULL
+  #
+  def __setstate__(self, state):
+    """
+    Unpickle a seed, unpacking its cells if they were packed. Pickles
+    made before the cells were packed are read as they are.
+    """
+    state = state.copy()
+    if ("packed_cells" in state):
+      [packed, yspan] = state.pop("packed_cells")
+      state["cells"] = unpack_cells(packed, yspan)
+    self.__dict__.update(state)
+  #
+  # __deepcopy__(self, memo) -- returns new_seed
+  #
+  def __deepcopy__(self, memo):
+    """
+    Copy a seed with its cells as they are. Without this, copy.deepcopy()
+    would go through __getstate__() and __setstate__(), packing and
+    unpacking the cells of every copy; the packing is only for pickles.
+    """
+    new_seed = Seed(0, 0, 0)
+    memo[id(self)] = new_seed
+    new_seed.__dict__.update(copy.deepcopy(self.__dict__, memo))
+    return new_seed
+  #
   # randomize(self, seed_density) -- returns NULL
   #
   def randomize(self, seed_density):
@@ -103,6 +196,19 @@ class Seed:
         if (self.cells[x][y] == 1):
           self.cells[x][y] = 2
   #
+  # random_location(self, g_xmin, g_xmax, g_ymin, g_ymax) 
+  # -- returns [g_xstart, g_ystart]
+  #
+  def random_location(self, g_xmin, g_xmax, g_ymin, g_ymax):
+    """
+    Choose a random location for the seed within the given bounds.
+    The seed's cell [0][0] goes to (g_xstart, g_ystart).
+    """
+    step = 1
+    g_xstart = rand.randrange(g_xmin, g_xmax - self.xspan, step)
+    g_ystart = rand.randrange(g_ymin, g_ymax - self.yspan, step)
+    return [g_xstart, g_ystart]
+  #
   # insert(self, g, g_xmin, g_xmax, g_ymin, g_ymax) -- returns NULL
   #
   def insert(self, g, g_xmin, g_xmax, g_ymin, g_ymax):
@@ -112,15 +218,11 @@ class Seed:
     g = the Golly universe
     s = a seed
     """
-    step = 1
-    g_xstart = rand.randrange(g_xmin, g_xmax - self.xspan, step)
-    g_ystart = rand.randrange(g_ymin, g_ymax - self.yspan, step)
-    for s_x in range(self.xspan):
-      for s_y in range(self.yspan):
-        g_x = g_xstart + s_x
-        g_y = g_ystart + s_y
-        s_state = self.cells[s_x][s_y]
-        g.setcell(g_x, g_y, s_state)
+    [g_xstart, g_ystart] = self.random_location(g_xmin, g_xmax, \
+      g_ymin, g_ymax)
+    # one call to Golly for the whole seed
+    g.putcells(cell_list(self.cells, g_xstart, g_ystart), \
+      0, 0, 1, 0, 0, 1, "copy")
   #
   # random_rotate(self) -- returns new_seed
   #
@@ -216,16 +318,16 @@ class Seed:
     # now do it
     if ((choice == 0) and (self.xspan > mparam.min_s_xspan)):
       # delete first row
-      self.cells = np.delete(self.cells, (0), axis=0) 
+      self.cells = self.cells[1:, :]
     elif ((choice == 1) and (self.xspan > mparam.min_s_xspan)):
       # delete last row
-      self.cells = np.delete(self.cells, (-1), axis=0) 
+      self.cells = self.cells[:-1, :]
     elif ((choice == 2) and (self.yspan > mparam.min_s_yspan)):
       # delete first column
-      self.cells = np.delete(self.cells, (0), axis=1) 
+      self.cells = self.cells[:, 1:]
     elif ((choice == 3) and (self.yspan > mparam.min_s_yspan)):
       # delete last column
-      self.cells = np.delete(self.cells, (-1), axis=1) 
+      self.cells = self.cells[:, :-1]
     # now let's update xspan and yspan to the new size
     self.xspan = self.cells.shape[0]
     self.yspan = self.cells.shape[1]
@@ -240,39 +342,27 @@ class Seed:
     """
     # - first we need to decide how to grow
     choice = rand.choice([0, 1, 2, 3])
+    # - make a new row (choice 0 or 1) or column (choice 2 or 3) with a
+    #   density of approximately seed_density
+    if (choice < 2):
+      length = self.yspan
+    else:
+      length = self.xspan
+    new_cells = np.array([int(rand.uniform(0, 1) < seed_density) \
+      for s in range(length)], dtype=np.int)
     # - now do it
     if (choice == 0):
-      # add a new row before the first row
-      self.cells = np.vstack([np.zeros(self.yspan, dtype=np.int), self.cells])
-      # initialize the new row with a density of approximately seed_density
-      for s_y in range(self.yspan):
-        if (rand.uniform(0, 1) < seed_density):
-          self.cells[0][s_y] = 1
-      #
+      # add the new row before the first row
+      self.cells = np.vstack([new_cells, self.cells])
     elif (choice == 1):
-      # add a new row after the last row
-      self.cells = np.vstack([self.cells, np.zeros(self.yspan, dtype=np.int)])
-      # initialize the new row with a density of approximately seed_density
-      for s_y in range(self.yspan):
-        if (rand.uniform(0, 1) < seed_density):
-          self.cells[-1][s_y] = 1
-      #
+      # add the new row after the last row
+      self.cells = np.vstack([self.cells, new_cells])
     elif (choice == 2):
-      # add a new column before the first column
-      self.cells = np.hstack([np.zeros((self.xspan, 1), dtype=np.int), self.cells])
-      # initialize the new column with a density of approximately seed_density
-      for s_x in range(self.xspan):
-        if (rand.uniform(0, 1) < seed_density):
-          self.cells[s_x][0] = 1
-      #
+      # add the new column before the first column
+      self.cells = np.hstack([new_cells.reshape((length, 1)), self.cells])
     elif (choice == 3):
-      # add a new column after the last column
-      self.cells = np.hstack([self.cells, np.zeros((self.xspan, 1), dtype=np.int)])
-      # initialize the new column with a density of approximately seed_density
-      for s_x in range(self.xspan):
-        if (rand.uniform(0, 1) < seed_density):
-          self.cells[s_x][-1] = 1
-      #
+      # add the new column after the last column
+      self.cells = np.hstack([self.cells, new_cells.reshape((length, 1))])
     #
     # now let's update xspan and yspan to the new size
     self.xspan = self.cells.shape[0]
@@ -285,12 +375,7 @@ class Seed:
     """
     Count the number of ones in a seed.
     """
-    count = 0
-    for x in range(self.xspan):
-      for y in range(self.yspan):
-        if (self.cells[x][y] == 1):
-          count = count + 1
-    return count
+    return int(np.count_nonzero(self.cells == 1))
   #
   # density(self) -- returns density of ones in a seed
   #
@@ -301,5 +386,292 @@ class Seed:
     return self.count_ones() / float(self.xspan * self.yspan)
   #
 #
+"""
+Make a class for populations.
+"""
+#
+class Population:
+  """
+  A population of seeds. The histories of all the seeds are kept in
+  one matrix, history[i][j] = the score of seed i against seed j, and
+  their similarities in another, similarities[i][j]. The history and
+  similarities of the seed at address i are views of row i of these
+  matrices, so code that works with one seed (seed.fitness(),
+  seed.similarities[j] = sim) sees and updates the matrices, and code
+  that works with the whole population (fitness_vector()) can use a
+  single NumPy operation. A population can be used like the list of
+  seeds that it replaces: pop[i], pop[i] = seed, len(pop), and for
+  seed in pop. The total of each row of the history is kept as a
+  whole number of half wins (see set_score()), so fitness costs
+  nothing to read and never drifts; scores must therefore be written
+  with set_score(), not into seed.history.
+  """
+  #
+  # __init__(self, seeds) -- returns NULL
+  #
+  def __init__(self, seeds):
+    """
+    Make a population from a list of seeds, in order of address.
+    """
+    pop_size = len(seeds)
+    self.history = np.zeros((pop_size, pop_size), dtype=np.float)
+    self.similarities = np.zeros((pop_size, pop_size), dtype=np.float)
+    # every score is a whole number of half wins out of num_trials games,
+    # so history[i][j] * units is an integer, and tallies[i] is the sum
+    # of history[i] * units
+    self.units = 2 * mparam.num_trials
+    self.tallies = np.zeros(pop_size, dtype=np.int64)
+    self.seeds = [None] * pop_size
+    # addresses whose fitness has changed since the index was updated
+    self.changed = set()
+    # the addresses of the seeds of each shape, (xspan, yspan)
+    self.shapes = {}
+    # the cells of each seed, packed into bits (see pack_cells())
+    self.packed = [None] * pop_size
+    for i in range(pop_size):
+      self[i] = seeds[i]
+    self.index = SelectionIndex(self.fitness_vector())
+    self.changed = set()
+  #
+  # __len__(self), __getitem__(self, i), __iter__(self) -- the seeds
+  #
+  def __len__(self):
+    return len(self.seeds)
+  def __getitem__(self, i):
+    return self.seeds[i]
+  def __iter__(self):
+    return iter(self.seeds)
+  #
+  # __setitem__(self, i, seed) -- returns NULL
+  #
+  def __setitem__(self, i, seed):
+    """
+    Put seed at address i. The history and similarities of the seed
+    are copied into row i of the matrices, and then they become views
+    of that row. The seed that was at address i gets its own copies of
+    its rows, so it keeps its values, as it did when the population
+    was a list.
+    """
+    old_seed = self.seeds[i]
+    if (old_seed is not None):
+      self.shapes[(old_seed.xspan, old_seed.yspan)].discard(i)
+    if (old_seed is not None) and (old_seed is not seed):
+      old_seed.history = old_seed.history.copy()
+      old_seed.similarities = old_seed.similarities.copy()
+    self.shapes.setdefault((seed.xspan, seed.yspan), set()).add(i)
+    self.history[i] = seed.history
+    self.similarities[i] = seed.similarities
+    self.tallies[i] = np.sum(np.rint(self.history[i] * self.units), \
+      dtype=np.int64)
+    seed.history = self.history[i]
+    seed.similarities = self.similarities[i]
+    seed.address = i
+    self.seeds[i] = seed
+    self.packed[i] = pack_cells(seed.cells)
+    self.changed.add(i)
+  #
+  # set_score(self, i, j, score) -- returns NULL
+  #
+  def set_score(self, i, j, score):
+    """
+    Record the score of seed i against seed j, and add the change to
+    the tally of row i, in O(1) time. The tallies are integers, so no
+    rounding errors build up, however often a score is replaced.
+    """
+    new_units = int(round(score * self.units))
+    assert abs(new_units - score * self.units) < 1e-6
+    old_units = int(round(self.history[i][j] * self.units))
+    self.tallies[i] += new_units - old_units
+    self.history[i][j] = score
+    self.changed.add(i)
+  #
+  # fitness_vector(self) -- returns fitness of every seed
+  #
+  def fitness_vector(self):
+    """
+    The fitness of every seed, in order of address, from the tallies of
+    the history rows. It is exact: with num_trials a power of 2 (as it
+    is by default), every partial sum is exact too, and it is the same
+    as Seed.fitness(), to the last bit.
+    """
+    return self.tallies / float(self.units) / len(self.seeds)
+  #
+  # update_similarities(self, i) -- returns NULL
+  #
+  def update_similarities(self, i):
+    """
+    Set row i and column i of the similarity matrix, as similarity()
+    in model_functions.py would for each pair. Seed i is compared with
+    all the seeds of its shape at once, by XOR of a stack of their
+    packed cells; seeds of other shapes have similarity 0.
+    """
+    seed = self.seeds[i]
+    area = seed.xspan * seed.yspan
+    same = np.array(sorted(self.shapes[(seed.xspan, seed.yspan)]), \
+      dtype=np.int64)
+    stack = np.array([self.packed[j] for j in same])
+    diffs = popcount_table[np.bitwise_xor(stack, self.packed[i])]
+    num_agree = area - np.sum(diffs, axis=(1, 2), dtype=np.int64)
+    row = np.zeros(len(self.seeds), dtype=np.float)
+    row[same] = num_agree / float(area)
+    row[i] = 1.0
+    self.similarities[i, :] = row
+    self.similarities[:, i] = row
+  #
+  # update_index(self) -- returns NULL
+  #
+  def update_index(self):
+    """
+    Bring the selection index up to date with the fitness vector.
+    A few changes are made one at a time, in O(log n) each, but a new
+    child changes the fitness of every seed (it plays them all), and
+    then it is quicker to rebuild the index in one pass.
+    """
+    if (len(self.changed) == 0):
+      return
+    fitness = self.fitness_vector()
+    if (len(self.changed) * self.index.depth > len(self.seeds)):
+      self.index.rebuild(fitness)
+    else:
+      for i in self.changed:
+        self.index.update(i, fitness[i])
+    self.changed = set()
+  #
+  # best_address(self), worst_address(self) -- return an address
+  #
+  def best_address(self):
+    """
+    The address of the fittest seed (the lowest address, if tied).
+    """
+    self.update_index()
+    return self.index.best_index()
+  def worst_address(self):
+    """
+    The address of the least fit seed (the lowest address, if tied).
+    """
+    self.update_index()
+    return self.index.worst_index()
+  #
+  # top_addresses(self, k) -- returns a list of addresses
+  #
+  def top_addresses(self, k):
+    """
+    The addresses of the k fittest seeds, in order of decreasing
+    fitness, with ties in order of address.
+    """
+    self.update_index()
+    return self.index.top(k)
+  #
+#
+"""
+Make a class for selection indexes.
+"""
+#
+class SelectionIndex:
+  """
+  An index of a vector of fitness values, for choosing seeds. Two
+  segment trees give the index of the highest and the lowest value
+  in O(1) time, and they are updated in O(log n) time when a value
+  changes. Each node of a tree holds the index of the best (or worst)
+  leaf below it. Ties go to the lowest index, as with np.argmax()
+  and np.argmin(), so the choices are the same as a linear scan.
+  """
+  #
+  # __init__(self, values) -- returns NULL
+  #
+  def __init__(self, values):
+    num_values = len(values)
+    # the number of leaves is a power of two; the extra leaves can
+    # never be chosen
+    size = 1
+    depth = 1
+    while (size < num_values):
+      size = size * 2
+      depth = depth + 1
+    self.num_values = num_values
+    self.size = size
+    self.depth = depth
+    self.high = np.full(size, -np.inf) # values, for the best tree
+    self.low = np.full(size, np.inf) # values, for the worst tree
+    # node k has children 2k and 2k + 1; the leaves are size to 2 size - 1
+    self.best = np.zeros(2 * size, dtype=np.int64)
+    self.worst = np.zeros(2 * size, dtype=np.int64)
+    self.rebuild(values)
+  #
+  # rebuild(self, values) -- returns NULL
+  #
+  def rebuild(self, values):
+    """
+    Build both trees from scratch, one level at a time.
+    """
+    self.high[:self.num_values] = values
+    self.low[:self.num_values] = values
+    self.best[self.size:] = np.arange(self.size)
+    self.worst[self.size:] = np.arange(self.size)
+    level = self.size
+    while (level > 1):
+      nodes = np.arange(int(level / 2), level)
+      left = self.best[2 * nodes]
+      right = self.best[2 * nodes + 1]
+      self.best[nodes] = np.where(self.high[left] >= self.high[right], \
+        left, right)
+      left = self.worst[2 * nodes]
+      right = self.worst[2 * nodes + 1]
+      self.worst[nodes] = np.where(self.low[left] <= self.low[right], \
+        left, right)
+      level = int(level / 2)
+  #
+  # update(self, i, value) -- returns NULL
+  #
+  def update(self, i, value):
+    """
+    Change the i-th value and fix the nodes above it.
+    """
+    self.high[i] = value
+    self.low[i] = value
+    node = int((self.size + i) / 2)
+    while (node >= 1):
+      [left, right] = [self.best[2 * node], self.best[2 * node + 1]]
+      if (self.high[left] >= self.high[right]):
+        self.best[node] = left
+      else:
+        self.best[node] = right
+      [left, right] = [self.worst[2 * node], self.worst[2 * node + 1]]
+      if (self.low[left] <= self.low[right]):
+        self.worst[node] = left
+      else:
+        self.worst[node] = right
+      node = int(node / 2)
+  #
+  # best_index(self), worst_index(self) -- return an index
+  #
+  def best_index(self):
+    return int(self.best[1])
+  def worst_index(self):
+    return int(self.worst[1])
+  #
+  # top(self, k) -- returns a list of indexes
+  #
+  def top(self, k):
+    """
+    The indexes of the k highest values, in order of decreasing value,
+    with ties in order of index (as a stable sort would give). Only the
+    values that can be in the top k are sorted: np.partition() finds
+    the k-th highest value in linear time, every value above it is in,
+    and the ties at that value are taken in order of index.
+    """
+    values = self.high[:self.num_values]
+    k = min(k, self.num_values)
+    if (k == 0):
+      return []
+    threshold = np.partition(values, self.num_values - k)[self.num_values - k]
+    above = np.nonzero(values > threshold)[0]
+    tied = np.nonzero(values == threshold)[0][:(k - len(above))]
+    chosen = np.concatenate([above, tied])
+    # sort by decreasing value, then by increasing index
+    order = np.lexsort((chosen, -values[chosen]))
+    return [int(i) for i in chosen[order]]
+  #
+#
 #
 #
\ No newline at end of file
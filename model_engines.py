@@ -0,0 +1,2137 @@
+"""
+Model Engines
+
+Headless simulation engines for the Immigration Game.
+
+An engine imitates the small part of the Golly scripting interface
+that Model-T uses (new, setrule, setcell, getcell, run, getgen, ...),
+so that an engine can be used in place of the Golly universe g in
+score_pair() and Seed.insert(). The engines do not need Golly.
+"""
+import model_parameters as mparam
+import numpy as np
+from multiprocessing.pool import ThreadPool
+import itertools
+import hashlib
+import json
+import time
+import random
+import re
+import os
+import zlib
+#
+# Note: As in model_classes.py, the board matrices are indexed [x][y],
+# where x is the horizontal Golly coordinate and y is the vertical
+# Golly coordinate. The Golly coordinate (g_xmin, g_ymin) -- see
+# get_minmax() in model_functions.py -- is stored in board[0][0].
+#
+# State 0 = dead (white), state 1 = red, state 2 = blue.
+#
+#
+# count_neighbours(plane) -- returns counts
+#
+def count_neighbours(plane):
+  """
+  Given a plane of 0s and 1s, count the number of 1s in the Moore
+  neighbourhood (the eight surrounding cells) of every cell. The
+  last two axes of the plane are toroidal (they wrap around), so
+  the plane may be a single board [x][y] or a stack of boards
+  [b][x][y].
+  """
+  # sum over each cell and its two neighbours along the x axis
+  rows = plane + np.roll(plane, 1, axis=-2) + np.roll(plane, -1, axis=-2)
+  # sum the row sums along the y axis and remove the centre cell
+  return rows + np.roll(rows, 1, axis=-1) + np.roll(rows, -1, axis=-1) - plane
+#
+# immigration_step(board) -- returns new_board
+#
+def immigration_step(board):
+  """
+  Apply one generation of the Immigration rule (Immigration.rule)
+  to a toroidal board of states 0, 1, and 2:
+
+  - a live cell with 2 or 3 live neighbours survives, keeping its colour
+  - a dead cell with exactly 3 live neighbours is born, taking the
+    colour of the majority of its live neighbours
+  - all other cells are dead in the next generation
+  """
+  red = (board == 1).astype(np.uint8)
+  blue = (board == 2).astype(np.uint8)
+  num_red = count_neighbours(red)
+  num_blue = count_neighbours(blue)
+  return apply_rule(board, num_red, num_blue)
+#
+# apply_rule(centre, num_red, num_blue) -- returns new_centre
+#
+def apply_rule(centre, num_red, num_blue):
+  """
+  Given the states of some cells and the numbers of red and blue
+  cells in their neighbourhoods, return the next states of the cells,
+  by looking them up in the compiled rule table (see rule_table()).
+  """
+  # the flat index into the 3 x 9 x 9 table fits in a byte (at most 242)
+  index = centre * np.uint8(81) + num_red * np.uint8(9) + num_blue
+  return np.take(rule_table().ravel(), index)
+#
+# padded_step(padded) -- returns new_interior
+#
+def padded_step(padded):
+  """
+  Apply one generation of the Immigration rule to the interior of
+  a padded block of cells [..., x, y]. The block has a margin of one
+  cell on every side, which supplies the neighbours of the interior
+  cells; the margin itself is not updated and nothing wraps around.
+  """
+  red = (padded == 1).astype(np.uint8)
+  blue = (padded == 2).astype(np.uint8)
+  [num_red, num_blue] = [0, 0]
+  for dx in [0, 1, 2]:
+    for dy in [0, 1, 2]:
+      if ((dx != 1) or (dy != 1)):
+        num_red = num_red + red[..., dx:(dx + red.shape[-2] - 2), \
+          dy:(dy + red.shape[-1] - 2)]
+        num_blue = num_blue + blue[..., dx:(dx + blue.shape[-2] - 2), \
+          dy:(dy + blue.shape[-1] - 2)]
+  return apply_rule(padded[..., 1:-1, 1:-1], num_red, num_blue)
+#
+# padded_life_step(padded) -- returns new_interior
+#
+def padded_life_step(padded):
+  """
+  Like padded_step(), for a padded block of 2-state Life cells (see
+  life_step()).
+  """
+  num_alive = 0
+  for dx in [0, 1, 2]:
+    for dy in [0, 1, 2]:
+      if ((dx != 1) or (dy != 1)):
+        num_alive = num_alive + padded[..., dx:(dx + padded.shape[-2] - 2), \
+          dy:(dy + padded.shape[-1] - 2)]
+  index = padded[..., 1:-1, 1:-1] * np.uint8(9) + num_alive
+  return np.take(life_rule_table().ravel(), index)
+#
+# striped_step(board, pool, num_stripes, padded_rule) -- returns new_board
+#
+def striped_step(board, pool, num_stripes, padded_rule = padded_step):
+  """
+  Apply one generation of the Immigration rule (or, with padded_rule
+  = padded_life_step, of 2-state Life) to a toroidal board [x][y], or
+  to every board of a stack [b][x][y], split into num_stripes stripes
+  of whole rows board[x] that are stepped in parallel on a pool of
+  threads. Each stripe is copied with a halo of one row on either side
+  and one column on either end (wrapping around the toroid), and
+  stepped with padded_rule. NumPy releases the GIL in its array loops,
+  so the threads run at once.
+  """
+  g_width = board.shape[-2]
+  bounds = np.linspace(0, g_width, num_stripes + 1).astype(int)
+  new_board = np.empty_like(board)
+  def step_stripe(k):
+    [start, stop] = [bounds[k], bounds[k + 1]]
+    rows = board[..., np.arange(start - 1, stop + 1) % g_width, :]
+    padded = np.concatenate([rows[..., -1:], rows, rows[..., :1]], axis=-1)
+    new_board[..., start:stop, :] = padded_rule(padded)
+  pool.map(step_stripe, range(num_stripes))
+  return new_board
+#
+# life_step(plane) -- returns new_plane
+#
+def life_step(plane):
+  """
+  Apply one generation of 2-state Life to a toroidal plane of 0s
+  and 1s (a board [x][y] or a stack [b][x][y]). Once one colour has
+  died out, it can never come back, and the Immigration rule acts on
+  the other colour as 2-state Life (see life_rule_table()).
+  """
+  index = plane * np.uint8(9) + count_neighbours(plane)
+  return np.take(life_rule_table().ravel(), index)
+#
+# life_rule_table() -- returns table
+#
+def life_rule_table():
+  """
+  Take the 2-state Life rule, table[alive][num_alive], from the
+  compiled Immigration rule, checking that neither colour can be born
+  without neighbours of its own colour and that red and blue follow
+  the same rule when alone.
+  """
+  table = rule_table()
+  red = table[0:2, :, 0]
+  blue = table[0::2, 0, :] // 2
+  assert np.array_equal(red, blue) and (red.max() <= 1), \
+    "Immigration.rule no longer acts as Life on a single colour"
+  return red.astype(np.uint8)
+#
+# Rule tables. The Immigration rule is defined in one place, the Golly
+# rule file Immigration.rule. Its @TABLE section is compiled into a
+# dense table, table[centre][num_red][num_blue], that gives the next
+# state of a cell from its state and the numbers of red (state 1) and
+# blue (state 2) cells among its eight neighbours. The compiled table
+# is cached in a file next to the rule file (Immigration.npz), and it
+# is compiled again whenever the rule file changes.
+#
+rule_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), \
+  "Immigration.rule")
+rule_table_cache = {}
+#
+# parse_rule_table(rule_text) -- returns [settings, variables, transitions]
+#
+def parse_rule_table(rule_text):
+  """
+  Read the @TABLE section of a Golly rule file. Returns a dictionary
+  of settings (n_states, neighborhood, symmetries), a dictionary that
+  maps variable names to lists of states, and a list of transitions.
+  Each transition is a list of terms (C, N, NE, E, SE, S, SW, W, NW, C'),
+  where a term is a state or a variable name.
+  """
+  settings = {}
+  variables = {}
+  transitions = []
+  in_table = False
+  for line in rule_text.splitlines():
+    # remove comments and surrounding white space
+    line = line.split("#")[0].strip()
+    if (line == ""):
+      continue
+    if (line.startswith("@")):
+      in_table = (line.split()[0] == "@TABLE")
+      continue
+    if (not in_table):
+      continue
+    if (line.startswith("var ")):
+      # var a={1,2}
+      [name, values] = line[4:].split("=")
+      states = []
+      for value in values.strip().strip("{}").split(","):
+        value = value.strip()
+        if (value in variables):
+          states.extend(variables[value])
+        else:
+          states.append(int(value))
+      variables[name.strip()] = states
+    elif (":" in line):
+      # n_states:3
+      [key, value] = line.split(":")
+      settings[key.strip()] = value.strip()
+    else:
+      # 0,a,1,1,0,0,0,0,0,1 -- a term may also be an inline list {1,2}
+      terms = re.findall(r'\{[^}]*\}|[^,\s]+', line)
+      transition = []
+      for term in terms:
+        if (term.startswith("{")):
+          name = "{" + str(len(variables)) + "}"
+          variables[name] = [int(value) for value in \
+            term.strip("{}").split(",")]
+          transition.append(name)
+        elif (term in variables):
+          transition.append(term)
+        else:
+          transition.append(int(term))
+      transitions.append(transition)
+  return [settings, variables, transitions]
+#
+# compile_rule_table(rule_text) -- returns table
+#
+def compile_rule_table(rule_text):
+  """
+  Compile the @TABLE section of a Golly rule file into a dense table,
+  table[centre][num_red][num_blue] = next state. Only 3-state rules
+  with the Moore neighbourhood and permute symmetry are handled: with
+  permute symmetry, only the numbers of neighbours in each state
+  matter, not their positions. As in Golly, a variable that appears
+  more than once in a transition has the same value everywhere in the
+  transition, the first matching transition wins, and a cell that
+  matches no transition keeps its state.
+  """
+  [settings, variables, transitions] = parse_rule_table(rule_text)
+  assert settings.get("n_states") == "3", "Only 3-state rules are handled."
+  assert settings.get("neighborhood") == "Moore", \
+    "Only the Moore neighbourhood is handled."
+  assert settings.get("symmetries") == "permute", \
+    "Only permute symmetry is handled."
+  table = np.zeros((3, 9, 9), dtype=np.uint8)
+  filled = np.zeros((3, 9, 9), dtype=bool)
+  for transition in transitions:
+    assert len(transition) == 10, "Bad transition: " + str(transition)
+    # every way of giving values to the variables in the transition
+    names = sorted(set([term for term in transition if term in variables]))
+    for values in itertools.product(*[variables[name] for name in names]):
+      binding = dict(zip(names, values))
+      states = [binding.get(term, term) for term in transition]
+      centre = states[0]
+      neighbours = states[1:9]
+      key = (centre, neighbours.count(1), neighbours.count(2))
+      if (not filled[key]):
+        table[key] = states[9]
+        filled[key] = True
+  # cells that match no transition keep their state
+  for centre in range(3):
+    table[centre][~filled[centre]] = centre
+  return table
+#
+# rule_table(path) -- returns table
+#
+def rule_table(path = rule_path):
+  """
+  Return the compiled table for the given rule file. The table is
+  kept in memory and in a cache file next to the rule file; the cache
+  is used as long as the rule file has not changed.
+  """
+  if (path in rule_table_cache):
+    return rule_table_cache[path]
+  rule_handle = open(path, "rb")
+  rule_bytes = rule_handle.read()
+  rule_handle.close()
+  digest = hashlib.md5(rule_bytes).hexdigest()
+  cache_path = os.path.splitext(path)[0] + ".npz"
+  table = None
+  if os.path.exists(cache_path):
+    cache = np.load(cache_path)
+    if (str(cache["digest"]) == digest):
+      table = cache["table"]
+    cache.close()
+  if (table is None):
+    table = compile_rule_table(rule_bytes.decode("ascii"))
+    try:
+      np.savez(cache_path, table=table, digest=np.array(digest))
+    except (IOError, OSError):
+      pass # the cache is optional; we can compile again next time
+  rule_table_cache[path] = table
+  return table
+#
+# parse_rule(rule) -- returns [rule_name, g_width, g_height]
+#
+def parse_rule(rule):
+  """
+  Split a Golly rule string such as "Immigration:T60,30" into the
+  rule name and the width and height of the toroid.
+  """
+  match = re.match(r'^(\w+):T(\d+),(\d+)$', rule)
+  assert match, "Only toroidal rules are supported: " + rule
+  return [match.group(1), int(match.group(2)), int(match.group(3))]
+#
+# Cycle detection. Many games settle into a still life or a short
+# oscillator long before the last generation. Once the board repeats
+# a state it had p generations earlier, it will keep repeating with
+# period p, so we can jump to the final phase instead of running every
+# generation. The results are exact, because a repeat is only accepted
+# after the two boards have been compared cell by cell.
+#
+hash_weight_cache = {}
+#
+# hash_weights(size) -- returns weights
+#
+def hash_weights(size):
+  """
+  Return a fixed vector of size random odd 64-bit weights, used to
+  hash boards. The weights come from their own random generator, so
+  they do not disturb the random numbers used by the model.
+  """
+  if (size not in hash_weight_cache):
+    generator = np.random.RandomState(size)
+    high = generator.randint(0, 2 ** 31, size).astype(np.uint64)
+    low = generator.randint(0, 2 ** 31, size).astype(np.uint64)
+    hash_weight_cache[size] = (high << np.uint64(33)) ^ \
+      (low << np.uint64(1)) ^ np.uint64(1)
+  return hash_weight_cache[size]
+#
+# hash_stack(state) -- returns hashes
+#
+def hash_stack(state):
+  """
+  Hash each board in a stack. The state is a list of arrays whose
+  first axis is the board number (see ToroidEngine.pack_stack()).
+  Equal boards have equal hashes; unequal boards almost always have
+  unequal hashes.
+  """
+  hashes = np.zeros(len(state[0]), dtype=np.uint64)
+  for array in state:
+    flat = array.reshape((len(array), -1))
+    hashes += np.dot(flat, hash_weights(flat.shape[1]))
+  return hashes
+#
+# group_sums(values, groups, num_groups) -- returns sums
+#
+def group_sums(values, groups, num_groups):
+  """
+  Sum the values in each group, where groups is sorted and holds the
+  group number (from 0 to num_groups - 1) of each value. Integer sums
+  wrap around, as in np.dot().
+  """
+  sums = np.zeros(num_groups, dtype=values.dtype)
+  starts = np.searchsorted(groups, np.arange(num_groups + 1))
+  full = (starts[1:] > starts[:-1])
+  if full.any():
+    sums[full] = np.add.reduceat(values, starts[:-1][full])
+  return sums
+#
+# Make a class for the boards of a stack that are still running.
+#
+class StackRun:
+  """
+  The boards of a stack that run_stack() is still running, with their
+  records for cycle detection. The engine steps, counts, joins, splits
+  and hashes the boards (see ToroidEngine.pack_stack()).
+  """
+  #
+  # __init__(self, engine, num_steps) -- returns NULL
+  #
+  def __init__(self, engine, num_steps):
+    self.engine = engine
+    self.num_steps = num_steps
+    self.window = engine.cycle_window
+    self.state = None
+    # boards[k] is the original number of the k-th board in the stack
+    self.boards = np.zeros(0, dtype=np.int64)
+    # the generation at which each board has its final count
+    self.finish = np.zeros(0, dtype=np.int64)
+    # recent hashes: ring[generation % window][k]
+    self.ring = np.zeros((max(self.window, 1), 0), dtype=np.uint64)
+    # a board is a suspect when its hash repeats after suspect_period
+    # generations; the suspicion is checked suspect_period generations
+    # later, by comparing the board with a copy (suspect_copy)
+    self.suspect_time = np.zeros(0, dtype=np.int64)
+    self.suspect_period = np.zeros(0, dtype=np.int64)
+    self.suspect_copy = {}
+  #
+  # size(self) -- returns number of boards
+  #
+  def size(self):
+    return len(self.boards)
+  #
+  # add(self, state, boards) -- returns NULL
+  #
+  def add(self, state, boards):
+    """
+    Add boards, with the given original numbers, to the stack. Their
+    hashes start out as zeros, so their cycle detection starts afresh.
+    """
+    num_new = len(boards)
+    if (self.state is None):
+      self.state = state
+    else:
+      self.state = self.engine.join_stacks(self.state, state)
+    self.boards = np.concatenate([self.boards, boards])
+    self.finish = np.concatenate([self.finish, \
+      np.zeros(num_new, dtype=np.int64) + self.num_steps])
+    self.ring = np.concatenate([self.ring, \
+      np.zeros((len(self.ring), num_new), dtype=np.uint64)], axis=1)
+    self.suspect_time = np.concatenate([self.suspect_time, \
+      np.zeros(num_new, dtype=np.int64) - 1])
+    self.suspect_period = np.concatenate([self.suspect_period, \
+      np.zeros(num_new, dtype=np.int64)])
+  #
+  # take(self, mask) -- returns [state, boards]
+  #
+  def take(self, mask):
+    """
+    Remove the boards where mask is True from the stack and return
+    their states and original numbers.
+    """
+    taken = [self.engine.select_boards(self.state, mask), self.boards[mask]]
+    for board in self.boards[mask]:
+      self.suspect_copy.pop(board, None)
+    keep = ~mask
+    self.state = self.engine.select_boards(self.state, keep)
+    self.boards = self.boards[keep]
+    self.finish = self.finish[keep]
+    self.ring = self.ring[:, keep]
+    self.suspect_time = self.suspect_time[keep]
+    self.suspect_period = self.suspect_period[keep]
+    return taken
+  #
+  # running(self) -- returns mask
+  #
+  def running(self):
+    """
+    The boards that are running normally: not in a cycle, and not
+    suspected of being in one.
+    """
+    return (self.suspect_time < 0) & (self.finish == self.num_steps)
+  #
+  # check_cycles(self, generation) -- returns NULL
+  #
+  def check_cycles(self, generation):
+    """
+    Look for boards that repeat a state from the last window
+    generations, and set the generation at which each board in a
+    cycle reaches the phase it would have at num_steps.
+    """
+    window = self.window
+    hashes = self.engine.hash_boards(self.state)
+    # check suspects whose period has passed
+    due = (self.suspect_time >= 0) & \
+      (generation == self.suspect_time + self.suspect_period)
+    for k in np.nonzero(due)[0]:
+      saved = self.suspect_copy.pop(self.boards[k])
+      if all([np.array_equal(array, old) for (array, old) \
+        in zip(self.engine.board_arrays(self.state, k), saved)]):
+        # a true cycle -- finish at the phase that matches num_steps
+        period = self.suspect_period[k]
+        self.finish[k] = generation + ((self.num_steps - generation) % period)
+      self.suspect_time[k] = -1
+    # look for new suspects among the boards that are running normally
+    free = self.running()
+    for period in range(1, min(generation, window) + 1):
+      repeat = free & (self.ring[(generation - period) % window] == hashes)
+      for k in np.nonzero(repeat)[0]:
+        self.suspect_copy[self.boards[k]] = \
+          self.engine.board_arrays(self.state, k)
+      self.suspect_time[repeat] = generation
+      self.suspect_period[repeat] = period
+      free = free & ~repeat
+    self.ring[generation % window] = hashes
+#
+# run_stack(engine, state, num_steps) -- returns counts
+#
+def run_stack(engine, state, num_steps):
+  """
+  Run a stack of boards for num_steps generations and return the final
+  populations of red and blue, counts[b] = [count1, count2]. When
+  engine.cycle_window is greater than zero, each board is checked for
+  cycles with periods of up to cycle_window generations. A board in a
+  cycle is run only until it reaches the phase it would have at
+  num_steps, and then it is removed from the stack (see StackRun).
+  Every engine.extinction_interval generations, the boards are checked
+  for dead colours: a board with no live cells is finished, and a
+  board with only one colour left is moved to a second stack, where
+  the surviving colour is run as 2-state Life, which the engine can
+  step more cheaply (see LifeStack). If engine.early_stop is True,
+  the scores are approximate: a board stops once one colour has led
+  for a while (see EarlyStopper).
+  """
+  num_boards = engine.stack_size(state)
+  counts = np.zeros((num_boards, 2), dtype=np.int64)
+  interval = engine.extinction_interval
+  # runs[0] holds the boards with both colours; runs[1], if the engine
+  # can run 2-state Life, holds the boards with one colour
+  runs = [StackRun(engine, num_steps)]
+  runs[0].add(state, np.arange(num_boards))
+  if hasattr(engine, "life_stack"):
+    runs.append(StackRun(LifeStack(engine), num_steps))
+  # the surviving colour of each board in runs[1]: 0 = red, 1 = blue
+  survivor = np.zeros(num_boards, dtype=np.int64)
+  #
+  # colour_counts(run, run_state, run_boards) -- returns counts
+  #
+  def colour_counts(run, run_state, run_boards):
+    """
+    The populations of red and blue in some boards of a run.
+    """
+    if (run is runs[0]):
+      return run.engine.count_stack(run_state)
+    run_counts = np.zeros((len(run_boards), 2), dtype=np.int64)
+    run_counts[np.arange(len(run_boards)), survivor[run_boards]] = \
+      run.engine.count_stack(run_state)[:, 0]
+    return run_counts
+  # for approximate scoring: leader[b] is the colour (1 = red, 2 = blue)
+  # that has led board b for streak[b] checkpoints in a row, and
+  # prediction[b] is the predicted winner of a board that is being
+  # played to the end to check the prediction
+  stopper = None
+  if (engine.early_stop):
+    stopper = early_stopper()
+    start_time = time.time()
+    leader = np.zeros(num_boards, dtype=np.int64)
+    streak = np.zeros(num_boards, dtype=np.int64)
+    prediction = np.zeros(num_boards, dtype=np.int64)
+  generation = 0
+  while True:
+    running = [run for run in runs if (run.size() > 0)]
+    if (len(running) == 0):
+      break
+    if (engine.cycle_window > 0):
+      for run in running:
+        run.check_cycles(generation)
+    # look for boards where a colour has died out
+    if (interval > 0) and (generation % interval == 0) and \
+      (generation < num_steps):
+      for run in running:
+        free = run.running()
+        stack_counts = run.engine.count_stack(run.state)
+        # with no live cells, nothing can ever be born again
+        run.finish[free & (stack_counts.max(axis=1) == 0)] = generation
+        # with one colour left, move the board to the Life stack; each
+        # stack costs time every generation, so this waits until none
+        # of the boards that are running normally has both colours
+        if (run is runs[0]) and (len(runs) > 1):
+          moved = free & (stack_counts.max(axis=1) > 0) & \
+            (stack_counts.min(axis=1) == 0)
+          if moved.any() and not (free & (stack_counts.min(axis=1) > 0)).any():
+            survivor[run.boards[moved]] = (stack_counts[moved][:, 0] == 0)
+            [moved_state, moved_boards] = run.take(moved)
+            runs[1].add(engine.life_stack(moved_state), moved_boards)
+    # approximate scoring: stop the boards where one colour has led
+    if (stopper is not None) and (generation > 0) and \
+      (generation % stopper.interval == 0) and (generation < num_steps):
+      for run in running:
+        rows = run.boards
+        if (len(rows) == 0):
+          continue
+        new_leader = stopper.leaders(colour_counts(run, run.state, rows))
+        streak[rows] = np.where((new_leader > 0) & \
+          (new_leader == leader[rows]), streak[rows] + 1, new_leader > 0)
+        leader[rows] = new_leader
+        ready = (run.finish == num_steps) & (prediction[rows] == 0) & \
+          (streak[rows] >= stopper.checks)
+        for k in np.nonzero(ready)[0]:
+          if stopper.audit():
+            # play this board to the end, to check the prediction
+            prediction[rows[k]] = new_leader[k]
+          else:
+            run.finish[k] = generation
+            stopper.stop(num_steps - generation)
+    # record and remove the boards that have their final counts
+    for run in runs:
+      done = (run.finish <= generation)
+      if done.any():
+        [done_state, done_boards] = run.take(done)
+        counts[done_boards] = colour_counts(run, done_state, done_boards)
+    # run the remaining boards for one generation
+    for run in runs:
+      if (run.size() > 0):
+        run.state = run.engine.step_stack(run.state)
+    generation = generation + 1
+  if (stopper is not None):
+    stopper.record(counts, prediction, num_steps, time.time() - start_time)
+  return counts
+#
+# Make a class for stacks of 2-state Life boards.
+#
+class LifeStack:
+  """
+  Lets run_stack() run the 2-state Life boards that an engine makes
+  with life_stack(), once one colour has died out. Counts are
+  [count, 0] whichever colour survived; run_stack() puts them in
+  the right column.
+  """
+  def __init__(self, engine):
+    self.engine = engine
+    self.cycle_window = engine.cycle_window
+  def step_stack(self, state):
+    return self.engine.step_life_stack(state)
+  def count_stack(self, state):
+    count = self.engine.count_life_stack(state)
+    return np.stack([count, np.zeros_like(count)], axis=1)
+  def stack_size(self, state):
+    return self.engine.stack_size(state)
+  def join_stacks(self, state, new_state):
+    return self.engine.join_stacks(state, new_state)
+  def select_boards(self, state, mask):
+    return self.engine.select_boards(state, mask)
+  def board_arrays(self, state, k):
+    return self.engine.board_arrays(state, k)
+  def hash_boards(self, state):
+    return self.engine.hash_boards(state)
+#
+# Make a class for engines.
+#
+class ToroidEngine:
+  """
+  The part of an Immigration Game engine that imitates the Golly
+  scripting interface. Subclasses store the board and implement
+  set_board(), get_board(), and step().
+  """
+  #
+  # __init__(self) -- returns NULL
+  #
+  def __init__(self):
+    """
+    Make an engine with an empty 1 x 1 toroid.
+    """
+    self.g_width = 1
+    self.g_height = 1
+    self.generation = 0
+    # the longest cycle period that is detected (0 = no detection)
+    self.cycle_window = mparam.cycle_window
+    # how often run_stack() looks for dead colours (0 = never)
+    self.extinction_interval = mparam.extinction_interval
+    # approximate scoring in run_stack() (see EarlyStopper)
+    self.early_stop = mparam.early_stop
+    self.set_board(np.zeros((1, 1), dtype=np.uint8))
+  #
+  # Golly functions that do nothing in a headless engine.
+  #
+  def setalgo(self, algo):
+    pass
+  def autoupdate(self, flag):
+    pass
+  def setmag(self, mag):
+    pass
+  def setcolors(self, colours):
+    pass
+  def update(self):
+    pass
+  #
+  # new(self, title) -- returns NULL
+  #
+  def new(self, title):
+    """
+    Like g.new(): clear the universe and reset the generation count.
+    """
+    self.generation = 0
+    self.set_board(np.zeros((self.g_width, self.g_height), dtype=np.uint8))
+  #
+  # setrule(self, rule) -- returns NULL
+  #
+  def setrule(self, rule):
+    """
+    Like g.setrule(): set the size of the toroid. The universe is
+    cleared, because the cells would no longer fit.
+    """
+    [rule_name, g_width, g_height] = parse_rule(rule)
+    assert rule_name == "Immigration"
+    self.g_width = g_width
+    self.g_height = g_height
+    self.new(rule_name)
+  #
+  # getwidth(self), getheight(self) -- return the toroid size
+  #
+  def getwidth(self):
+    return self.g_width
+  def getheight(self):
+    return self.g_height
+  #
+  # getgen(self) -- returns the generation count as a string, like Golly
+  #
+  def getgen(self):
+    return str(self.generation)
+  #
+  # to_index(self, x, y) -- returns [i, j]
+  #
+  def to_index(self, x, y):
+    """
+    Convert Golly coordinates to board indices.
+    """
+    i = (x + int(self.g_width / 2)) % self.g_width
+    j = (y + int(self.g_height / 2)) % self.g_height
+    return [i, j]
+  #
+  # setcell(self, x, y, state) -- returns NULL
+  #
+  def setcell(self, x, y, state):
+    [i, j] = self.to_index(x, y)
+    board = self.get_board()
+    board[i][j] = state
+    self.set_board(board)
+  #
+  # getcell(self, x, y) -- returns state
+  #
+  def getcell(self, x, y):
+    [i, j] = self.to_index(x, y)
+    return int(self.get_board()[i][j])
+  #
+  # putcells(self, cell_list, x0, y0, A, B, C, D, mode) -- returns NULL
+  #
+  def putcells(self, cell_list, x0 = 0, y0 = 0, A = 1, B = 0, C = 0, \
+    D = 1, mode = "or"):
+    """
+    Like g.putcells() with a multi-state cell list [x1, y1, state1,
+    x2, y2, state2, ...], which may end with a padding 0. In "copy"
+    mode every listed cell is set, including cells with state 0; in
+    "or" mode only the live cells are set. Transformations are not
+    supported.
+    """
+    assert [A, B, C, D] == [1, 0, 0, 1]
+    assert mode in ["or", "copy"]
+    num_cells = int(len(cell_list) / 3)
+    triples = np.array(cell_list[:3 * num_cells], \
+      dtype=np.int64).reshape((num_cells, 3))
+    if (mode == "or"):
+      triples = triples[triples[:, 2] > 0]
+    xs = (triples[:, 0] + x0 + int(self.g_width / 2)) % self.g_width
+    ys = (triples[:, 1] + y0 + int(self.g_height / 2)) % self.g_height
+    board = self.get_board()
+    board[xs, ys] = triples[:, 2]
+    self.set_board(board)
+  #
+  # getrect(self) -- returns [x, y, width, height]
+  #
+  def getrect(self):
+    """
+    Like g.getrect(): the bounding box of the live cells, or [] if
+    there are none.
+    """
+    [xs, ys] = np.nonzero(self.get_board())
+    if (len(xs) == 0):
+      return []
+    x = int(xs.min()) - int(self.g_width / 2)
+    y = int(ys.min()) - int(self.g_height / 2)
+    return [x, y, int(xs.max() - xs.min()) + 1, int(ys.max() - ys.min()) + 1]
+  #
+  # getcells(self, rect) -- returns cell_list
+  #
+  def getcells(self, rect):
+    """
+    Like g.getcells(): the live cells in the rectangle [x, y, width,
+    height] as a multi-state cell list [x1, y1, state1, ...], padded
+    with a 0 when its length would be even.
+    """
+    if (len(rect) == 0):
+      return []
+    [x, y, width, height] = rect
+    board = self.get_board()
+    xs = (np.arange(x, x + width) + int(self.g_width / 2)) % self.g_width
+    ys = (np.arange(y, y + height) + int(self.g_height / 2)) % self.g_height
+    window = board[np.ix_(xs, ys)]
+    [wxs, wys] = np.nonzero(window)
+    triples = np.stack([wxs + x, wys + y, window[wxs, wys]], axis=1)
+    cell_list = triples.astype(np.int64).ravel().tolist()
+    if (len(cell_list) > 0) and (len(cell_list) % 2 == 0):
+      cell_list.append(0)
+    return cell_list
+  #
+  # run(self, num_steps) -- returns NULL
+  #
+  def run(self, num_steps):
+    """
+    Like g.run(): advance the universe num_steps generations. If the
+    board returns to a state that it had within the last cycle_window
+    generations, skip ahead to the phase of the cycle that it would
+    have after num_steps generations.
+    """
+    end = self.generation + num_steps
+    # recent states, mapped to the generations when they were seen
+    seen = {}
+    recent = []
+    while (self.generation < end):
+      if (self.cycle_window > 0):
+        key = self.state_key()
+        if (key in seen):
+          period = self.generation - seen[key]
+          for step in range((end - self.generation) % period):
+            self.step()
+          self.generation = end
+          return
+        seen[key] = self.generation
+        recent.append(key)
+        if (len(recent) > self.cycle_window):
+          del seen[recent.pop(0)]
+      self.step()
+      self.generation = self.generation + 1
+  #
+  # state_key(self) -- returns the board as a string of bytes
+  #
+  def state_key(self):
+    return self.get_board().tobytes()
+  #
+  # count_pops(self) -- returns [count1, count2]
+  #
+  def count_pops(self):
+    """
+    Count the populations of state 1 (red) and state 2 (blue).
+    """
+    board = self.get_board()
+    count1 = int(np.count_nonzero(board == 1))
+    count2 = int(np.count_nonzero(board == 2))
+    return [count1, count2]
+  #
+  # run_batch(self, boards, num_steps) -- returns counts
+  #
+  def run_batch(self, boards, num_steps):
+    """
+    Run a stack of boards [b][x][y], all with the same toroid size,
+    for num_steps generations and return the populations of red and
+    blue, counts[b] = [count1, count2]. See run_stack().
+    """
+    return run_stack(self, self.pack_stack(boards), num_steps)
+  #
+  # pack_stack(self, boards), step_stack(self, state), 
+  # count_stack(self, state) -- used by run_stack()
+  #
+  # The state of a stack is a list of arrays, each with the board
+  # number as its first axis. Engines that can step many boards at
+  # once override these; here the boards are stepped one at a time.
+  #
+  def pack_stack(self, boards):
+    return [boards]
+  def step_stack(self, state):
+    [boards] = state
+    new_boards = np.zeros_like(boards)
+    for b in range(len(boards)):
+      self.set_board(boards[b])
+      self.step()
+      new_boards[b] = self.get_board()
+    return [new_boards]
+  def count_stack(self, state):
+    [boards] = state
+    count1 = np.sum(boards == 1, axis=(1, 2))
+    count2 = np.sum(boards == 2, axis=(1, 2))
+    return np.stack([count1, count2], axis=1)
+  #
+  # stack_size(self, state), join_stacks(self, state, new_state),
+  # select_boards(self, state, mask), board_arrays(self, state, k),
+  # hash_boards(self, state) -- used by run_stack() and StackRun
+  #
+  # These work on any state that is a list of arrays with the board
+  # number as their first axis. An engine with some other kind of
+  # state overrides them (see SparseEngine). board_arrays() returns
+  # copies of the arrays of board k, for comparing boards exactly.
+  #
+  def stack_size(self, state):
+    return len(state[0])
+  def join_stacks(self, state, new_state):
+    return [np.concatenate([old, new]) for (old, new) \
+      in zip(state, new_state)]
+  def select_boards(self, state, mask):
+    return [array[mask] for array in state]
+  def board_arrays(self, state, k):
+    return [array[k].copy() for array in state]
+  def hash_boards(self, state):
+    return hash_stack(state)
+  #
+  # life_stack(self, state), step_life_stack(self, state),
+  # count_life_stack(self, state) -- used by run_stack()
+  #
+  # Once one colour has died out, a board is stepped as 2-state Life
+  # (see life_step()), as a stack of planes of 0s and 1s.
+  #
+  def life_stack(self, state):
+    [boards] = state
+    return [(boards > 0).astype(np.uint8)]
+  def step_life_stack(self, state):
+    return [life_step(state[0])]
+  def count_life_stack(self, state):
+    return np.sum(state[0], axis=(1, 2), dtype=np.int64)
+#
+# Make a class for the dense NumPy engine.
+#
+class DenseEngine(ToroidEngine):
+  """
+  The whole toroid is stored as one byte per cell and every
+  generation is computed with NumPy array operations. Big boards,
+  alone or in a stack, are split into stripes that are stepped on a
+  pool of threads (see striped_step()).
+  """
+  def __init__(self):
+    self.num_threads = mparam.num_threads
+    self.pool = None
+    ToroidEngine.__init__(self)
+  def set_board(self, board):
+    self.board = board
+  def get_board(self):
+    return self.board
+  def step(self):
+    self.board = self.step_stack([self.board[np.newaxis]])[0][0]
+  def thread_pool(self):
+    """
+    The pool of num_threads threads, or None for no threads.
+    """
+    if (self.num_threads <= 1):
+      return None
+    if (self.pool is None):
+      self.pool = ThreadPool(self.num_threads)
+    return self.pool
+  def striped(self, boards):
+    # stripe the boards of a stack if each of them is big enough
+    return (self.num_threads > 1) and \
+      (boards[0].size >= mparam.min_stripe_cells)
+  def step_stack(self, state):
+    boards = state[0]
+    if self.striped(boards):
+      return [striped_step(boards, self.thread_pool(), self.num_threads)]
+    return [immigration_step(boards)]
+  def step_life_stack(self, state):
+    planes = state[0]
+    if self.striped(planes):
+      return [striped_step(planes, self.thread_pool(), self.num_threads, \
+        padded_life_step)]
+    return [life_step(planes)]
+#
+# tiled_step(boards, active, tile_size, padded_rule, pool, num_threads) 
+# -- returns [new_active, hash_changes]
+#
+def tiled_step(boards, active, tile_size, padded_rule, pool = None, \
+  num_threads = 1):
+  """
+  Apply one generation to the active tiles of a stack of toroidal
+  boards [b][x][y], in place, with padded_rule (padded_step(), or
+  padded_life_step() for 2-state Life), and return the next active
+  tiles and the change in the hash of each board (see hash_stack()),
+  so that the hashes need not be computed from the whole boards.
+  Each board is divided into square tiles of tile_size x
+  tile_size cells, and active[b][i][j] is True if tile [i][j] of
+  board b must be stepped: it, or one of its eight neighbouring
+  tiles, changed in the last generation; the cells of every other
+  tile cannot change. The tiles at the right and bottom edges may
+  hang over the edge of the toroid; their extra cells are never
+  written back. When the active tiles hold at least min_stripe_cells
+  cells (see model_parameters.py), they are split into num_threads
+  groups that are stepped in parallel on the pool of threads; the
+  new cells are only written back once every group is done.
+  """
+  [num_boards, g_width, g_height] = boards.shape
+  size = tile_size
+  [tile_b, tile_x, tile_y] = np.nonzero(active)
+  tile_changed = np.zeros_like(active)
+  hash_changes = np.zeros(num_boards, dtype=np.uint64)
+  if (len(tile_b) > 0):
+    # indices of the cells of the active tiles, with a margin of one
+    # cell, wrapping around the toroid
+    offsets = np.arange(-1, size + 1)
+    xs = (tile_x[:, np.newaxis] * size + offsets) % g_width
+    ys = (tile_y[:, np.newaxis] * size + offsets) % g_height
+    # gather them by their flat index in the stack, which is quicker
+    # than indexing along three axes
+    flat = (tile_b * (g_width * g_height))[:, np.newaxis, np.newaxis] + \
+      (xs * g_height)[:, :, np.newaxis] + ys[:, np.newaxis, :]
+    cells = boards.reshape(-1)
+    def step_tiles(tiles):
+      padded = np.take(cells, flat[tiles])
+      return [padded_rule(padded), padded[:, 1:-1, 1:-1]]
+    num_groups = 1
+    if (pool is not None) and \
+      (len(tile_b) * size * size >= mparam.min_stripe_cells):
+      num_groups = min(num_threads, len(tile_b))
+    bounds = np.linspace(0, len(tile_b), num_groups + 1).astype(int)
+    groups = [slice(bounds[n], bounds[n + 1]) for n in range(num_groups)]
+    if (num_groups == 1):
+      [new_tiles, old_tiles] = step_tiles(groups[0])
+    else:
+      results = pool.map(step_tiles, groups)
+      new_tiles = np.concatenate([result[0] for result in results])
+      old_tiles = np.concatenate([result[1] for result in results])
+    # only write back the cells that lie inside the toroid
+    inner_x = tile_x[:, np.newaxis] * size + np.arange(size)
+    inner_y = tile_y[:, np.newaxis] * size + np.arange(size)
+    inside = (inner_x[:, :, np.newaxis] < g_width) & \
+      (inner_y[:, np.newaxis, :] < g_height)
+    changed = (new_tiles != old_tiles) & inside
+    [k, i, j] = np.nonzero(changed)
+    boards[tile_b[k], inner_x[k, i], inner_y[k, j]] = new_tiles[k, i, j]
+    tile_changed[tile_b, tile_x, tile_y] = changed.any(axis=(1, 2))
+    # the hashes change by (new - old) * weight for each changed cell
+    weights = hash_weights(g_width * g_height)[inner_x[k, i] * g_height + \
+      inner_y[k, j]]
+    hash_changes = group_sums(new_tiles[k, i, j].astype(np.uint64) * \
+      weights - old_tiles[k, i, j].astype(np.uint64) * weights, \
+      tile_b[k], num_boards)
+  # the next active tiles are the changed tiles and their neighbours
+  near_x = tile_changed | np.roll(tile_changed, 1, axis=1) | \
+    np.roll(tile_changed, -1, axis=1)
+  new_active = near_x | np.roll(near_x, 1, axis=2) | \
+    np.roll(near_x, -1, axis=2)
+  return [new_active, hash_changes]
+#
+# Make a class for the tiled engine.
+#
+class TiledEngine(DenseEngine):
+  """
+  Only the active tiles of the toroid are stepped (see tiled_step()).
+  A stack of boards (see play_games()) keeps the active tiles and the
+  hash of each of its boards, [boards, active, hashes], so each board
+  is stepped and hashed only where something is happening on it, for
+  both the Immigration rule and 2-state Life.
+  """
+  def __init__(self):
+    self.tile_size = mparam.tile_size
+    DenseEngine.__init__(self)
+  def all_tiles(self, boards):
+    """
+    Mark every tile of a stack of boards as active, as after a change
+    from outside.
+    """
+    [num_boards, g_width, g_height] = boards.shape
+    size = self.tile_size
+    return np.ones((num_boards, int((g_width + size - 1) / size), \
+      int((g_height + size - 1) / size)), dtype=bool)
+  def set_board(self, board):
+    # the board is stepped in place, so the caller's board is copied
+    self.board = np.array(board, dtype=np.uint8)
+    self.active = self.all_tiles(self.board[np.newaxis])
+  def step(self):
+    [self.active, hash_changes] = tiled_step(self.board[np.newaxis], \
+      self.active, self.tile_size, padded_step, self.thread_pool(), \
+      self.num_threads)
+  def pack_stack(self, boards):
+    # the boards are stepped in place, so they are copied first
+    boards = np.array(boards, dtype=np.uint8)
+    return [boards, self.all_tiles(boards), hash_stack([boards])]
+  def step_stack(self, state):
+    [boards, active, hashes] = state
+    [active, hash_changes] = tiled_step(boards, active, self.tile_size, \
+      padded_step, self.thread_pool(), self.num_threads)
+    return [boards, active, hashes + hash_changes]
+  def count_stack(self, state):
+    return DenseEngine.count_stack(self, state[:1])
+  def life_stack(self, state):
+    # 2-state Life changes the same cells as the Immigration rule on
+    # a board with one colour, so the active tiles carry over
+    planes = (state[0] > 0).astype(np.uint8)
+    return [planes, state[1], hash_stack([planes])]
+  def step_life_stack(self, state):
+    [planes, active, hashes] = state
+    [active, hash_changes] = tiled_step(planes, active, self.tile_size, \
+      padded_life_step, self.thread_pool(), self.num_threads)
+    return [planes, active, hashes + hash_changes]
+  def count_life_stack(self, state):
+    return DenseEngine.count_life_stack(self, state[:1])
+  def board_arrays(self, state, k):
+    # the active tiles and the hash are not part of the board
+    return [state[0][k].copy()]
+  def hash_boards(self, state):
+    return state[2]
+#
+# Sparse stacks. The sparse engine stores a stack of boards as one list
+# of live cells, so that the work of each generation grows with the
+# number of live cells in the stack, rather than with the area of the
+# toroids.
+#
+class SparseStack:
+  """
+  The live cells of a stack of num_boards boards, all g_width x
+  g_height. The i-th live cell is on board boards[i], at position
+  positions[i] = x * g_height + y, in state states[i]. The cells are
+  sorted by board and then by position.
+  """
+  def __init__(self, num_boards, shape, boards, positions, states):
+    self.num_boards = num_boards
+    self.shape = shape
+    self.boards = boards
+    self.positions = positions
+    self.states = states
+#
+# sparse_step(stack, life) -- returns new_stack
+#
+def sparse_step(stack, life):
+  """
+  Apply one generation of the Immigration rule, or of 2-state Life if
+  life is True, to a SparseStack. Every live cell, and each of its
+  neighbours, is a candidate for the next generation; a live cell
+  adds 1 to the red or blue count of each of its neighbours.
+  """
+  [g_width, g_height] = stack.shape
+  area = g_width * g_height
+  xs = stack.positions // g_height
+  ys = stack.positions % g_height
+  base = stack.boards * area
+  candidates = [base + stack.positions]
+  for dx in [-1, 0, 1]:
+    for dy in [-1, 0, 1]:
+      if ((dx != 0) or (dy != 0)):
+        candidates.append(base + ((xs + dx) % g_width) * g_height + \
+          (ys + dy) % g_height)
+  [cells, inverse] = np.unique(np.concatenate(candidates), \
+    return_inverse=True)
+  # the live cells come first, so their states are at the positions
+  # given by the start of inverse, and their neighbours follow
+  num_live = len(stack.states)
+  centre = np.zeros(len(cells), dtype=np.uint8)
+  centre[inverse[:num_live]] = stack.states
+  neighbours = inverse[num_live:]
+  if life:
+    num_neighbours = np.bincount(neighbours, \
+      minlength=len(cells)).astype(np.uint8)
+    new_states = np.take(life_rule_table().ravel(), \
+      centre * np.uint8(9) + num_neighbours)
+  else:
+    red = np.tile(stack.states == 1, 8)
+    blue = np.tile(stack.states == 2, 8)
+    num_red = np.bincount(neighbours[red], \
+      minlength=len(cells)).astype(np.uint8)
+    num_blue = np.bincount(neighbours[blue], \
+      minlength=len(cells)).astype(np.uint8)
+    new_states = apply_rule(centre, num_red, num_blue)
+  alive = (new_states > 0)
+  return SparseStack(stack.num_boards, stack.shape, cells[alive] // area, \
+    cells[alive] % area, new_states[alive])
+#
+# Make a class for the sparse engine.
+#
+class SparseEngine(ToroidEngine):
+  """
+  Only the live cells are stored (see SparseStack), and each
+  generation is computed from the eight neighbours of the live cells
+  (see sparse_step()), so the work grows with the number of live
+  cells rather than with the area of the toroid. A single board is a
+  stack of one board. This suits big, sparse patterns.
+  """
+  def __init__(self):
+    # a dead cell with no live neighbours must stay dead, or the live
+    # cells would not be enough to find every change
+    assert rule_table()[0][0][0] == 0
+    ToroidEngine.__init__(self)
+  def set_board(self, board):
+    self.stack = self.pack_stack(board[np.newaxis])
+  def get_board(self):
+    board = np.zeros(self.stack.shape, dtype=np.uint8)
+    board.flat[self.stack.positions] = self.stack.states
+    return board
+  def state_key(self):
+    return self.stack.positions.tobytes() + self.stack.states.tobytes()
+  def step(self):
+    self.stack = sparse_step(self.stack, False)
+  def count_pops(self):
+    [[count1, count2]] = self.count_stack(self.stack)
+    return [int(count1), int(count2)]
+  def pack_stack(self, boards):
+    [num_boards, g_width, g_height] = boards.shape
+    [bs, xs, ys] = np.nonzero(boards)
+    return SparseStack(num_boards, (g_width, g_height), bs.astype(np.int64), \
+      xs.astype(np.int64) * g_height + ys, boards[bs, xs, ys])
+  def step_stack(self, state):
+    return sparse_step(state, False)
+  def count_stack(self, state):
+    count1 = np.bincount(state.boards[state.states == 1], \
+      minlength=state.num_boards)
+    count2 = np.bincount(state.boards[state.states == 2], \
+      minlength=state.num_boards)
+    return np.stack([count1, count2], axis=1).astype(np.int64)
+  def life_stack(self, state):
+    return SparseStack(state.num_boards, state.shape, state.boards, \
+      state.positions, np.ones_like(state.states))
+  def step_life_stack(self, state):
+    return sparse_step(state, True)
+  def count_life_stack(self, state):
+    return np.bincount(state.boards, \
+      minlength=state.num_boards).astype(np.int64)
+  def stack_size(self, state):
+    return state.num_boards
+  def join_stacks(self, state, new_state):
+    return SparseStack(state.num_boards + new_state.num_boards, state.shape, \
+      np.concatenate([state.boards, new_state.boards + state.num_boards]), \
+      np.concatenate([state.positions, new_state.positions]), \
+      np.concatenate([state.states, new_state.states]))
+  def select_boards(self, state, mask):
+    # number the chosen boards from 0, keeping their order
+    number = np.cumsum(mask) - 1
+    keep = mask[state.boards]
+    return SparseStack(int(np.sum(mask)), state.shape, \
+      number[state.boards[keep]], state.positions[keep], state.states[keep])
+  def board_arrays(self, state, k):
+    [start, stop] = np.searchsorted(state.boards, [k, k + 1])
+    return [state.positions[start:stop].copy(), \
+      state.states[start:stop].copy()]
+  def hash_boards(self, state):
+    # the same hashes as hash_stack() gives for the full boards
+    [g_width, g_height] = state.shape
+    weights = hash_weights(g_width * g_height)
+    return group_sums(state.states.astype(np.uint64) * \
+      weights[state.positions], state.boards, state.num_boards)
+#
+# Compiled kernel. If Numba is installed, the "jit" engine steps its
+# boards with a compiled loop that counts the red and blue neighbours
+# of each cell, looks up its next state in the rule table, and counts
+# the new populations, all in one pass over the toroid, without the
+# board-sized temporary arrays of immigration_step(). The compiled
+# code is cached on disk (in __pycache__), so later runs and other
+# processes load it instead of compiling it again; one compiled version
+# serves boards of every size. Without Numba, the "jit" engine is the
+# "numpy" engine. Importing Numba takes a large part of a second, so
+# it is only imported when a "jit" engine is made.
+#
+# module_available(name) -- returns True or False
+#
+def module_available(name):
+  """
+  Check whether a module is installed, without importing it. Under
+  Python 2 (as in Golly) there is no importlib.util, and the compiled
+  kernel is not used.
+  """
+  try:
+    import importlib.util
+  except ImportError:
+    return False
+  return (importlib.util.find_spec(name) is not None)
+#
+numba_available = module_available("numba")
+kernel_cache = []
+#
+# jit_step_stack(boards, new_boards, table, counts) -- returns NULL
+#
+def jit_step_stack(boards, new_boards, table, counts):
+  """
+  Apply one generation of the Immigration rule to a stack of toroidal
+  boards [b][x][y] (uint8), writing the result into new_boards and the
+  new populations of red and blue into counts[b]. The table is the
+  flat rule table (see apply_rule()).
+  """
+  [num_boards, g_width, g_height] = boards.shape
+  # each cell adds 1 if it is red (state 1) or 16 if it is blue
+  # (state 2) to the sums, so that one sum counts both colours
+  rows = np.zeros(g_height, dtype=np.int32)
+  for b in range(num_boards):
+    board = boards[b]
+    new_board = new_boards[b]
+    count1 = 0
+    count2 = 0
+    for x in range(g_width):
+      west = board[(x + g_width - 1) % g_width]
+      centre = board[x]
+      east = board[(x + 1) % g_width]
+      # the sums for each cell and its west and east neighbours
+      for y in range(g_height):
+        rows[y] = (west[y] & 1) + 8 * (west[y] & 2) + \
+          (centre[y] & 1) + 8 * (centre[y] & 2) + \
+          (east[y] & 1) + 8 * (east[y] & 2)
+      north = g_height - 1
+      for y in range(g_height):
+        south = y + 1
+        if (south == g_height):
+          south = 0
+        state = centre[y]
+        total = rows[north] + rows[y] + rows[south] - \
+          ((state & 1) + 8 * (state & 2))
+        new_state = table[state * 81 + (total & 15) * 9 + (total >> 4)]
+        new_board[x, y] = new_state
+        # state 1 adds 1 to count1 and state 2 adds 1 to count2
+        count1 += new_state & 1
+        count2 += new_state >> 1
+        north = y
+    counts[b, 0] = count1
+    counts[b, 1] = count2
+#
+#
+# compiled_step_stack() -- returns kernel
+#
+def compiled_step_stack():
+  """
+  Return jit_step_stack() compiled by Numba, importing Numba and
+  compiling the kernel (or loading it from the disk cache) the first
+  time.
+  """
+  if (len(kernel_cache) == 0):
+    import numba
+    kernel_cache.append(numba.njit(cache=True, nogil=True)(jit_step_stack))
+  return kernel_cache[0]
+#
+# Make a class for the compiled engine.
+#
+class JitEngine(DenseEngine):
+  """
+  The dense engine, with each generation computed by the compiled
+  kernel jit_step_stack() when Numba is installed.
+  """
+  def __init__(self):
+    # the boards from the last step_stack() and their populations
+    self.stack_counts = [None, None]
+    self.kernel = None
+    if numba_available:
+      self.kernel = compiled_step_stack()
+    DenseEngine.__init__(self)
+  def step_stack(self, state):
+    if (self.kernel is None):
+      return DenseEngine.step_stack(self, state)
+    boards = np.ascontiguousarray(state[0], dtype=np.uint8)
+    new_boards = np.empty_like(boards)
+    counts = np.zeros((len(boards), 2), dtype=np.int64)
+    self.kernel(boards, new_boards, rule_table().ravel(), counts)
+    self.stack_counts = [new_boards, counts]
+    return [new_boards]
+  def count_stack(self, state):
+    # the kernel has already counted the boards that it just made
+    if (state[0] is self.stack_counts[0]):
+      return self.stack_counts[1]
+    return DenseEngine.count_stack(self, state)
+#
+# Bit-packed boards. A board is stored as two bit-planes: "alive" (the
+# cell is in state 1 or 2) and "blue" (the cell is in state 2). Each
+# plane is an array [y][k] of 64-bit words, where bit b of word k in
+# row y is the cell with x index 64 * k + b. Bits beyond the width of
+# the toroid are always zero. Thus a plane uses one bit per cell.
+#
+word_size = 64
+one = np.uint64(1)
+#
+# popcount_table[byte] -- the number of ones in each possible byte
+#
+popcount_table = np.array([bin(byte).count("1") for byte in range(256)], \
+  dtype=np.uint8)
+#
+# popcount(plane) -- returns number of ones in a plane
+#
+def popcount(plane):
+  """
+  Count the ones in a plane of 64-bit words, one byte at a time.
+  """
+  return int(popcount_table[plane.view(np.uint8)].sum(dtype=np.int64))
+#
+# popcount_stack(planes) -- returns counts
+#
+def popcount_stack(planes):
+  """
+  Count the ones in each plane of a stack of planes [b][y][k].
+  """
+  bytes_per_plane = planes[0].size * 8
+  counts = popcount_table[planes.view(np.uint8)]
+  return counts.reshape((len(planes), bytes_per_plane)).sum(axis=1, \
+    dtype=np.int64)
+#
+# pack_plane(cells) -- returns plane
+#
+def pack_plane(cells):
+  """
+  Pack a matrix of 0s and 1s, indexed [y][x], into a plane of
+  64-bit words. A stack of matrices [b][y][x] is packed into a
+  stack of planes.
+  """
+  outer_shape = cells.shape[:-1]
+  g_width = cells.shape[-1]
+  num_words = int((g_width + word_size - 1) / word_size)
+  bits = np.zeros(outer_shape + (num_words * word_size,), dtype=np.uint64)
+  bits[..., :g_width] = cells
+  bits = bits.reshape(outer_shape + (num_words, word_size))
+  shifts = np.arange(word_size, dtype=np.uint64)
+  return np.bitwise_or.reduce(bits << shifts, axis=-1)
+#
+# unpack_plane(plane, g_width) -- returns cells
+#
+def unpack_plane(plane, g_width):
+  """
+  Unpack a plane of 64-bit words into a matrix of 0s and 1s,
+  indexed [y][x].
+  """
+  shifts = np.arange(word_size, dtype=np.uint64)
+  bits = (plane[..., np.newaxis] >> shifts) & one
+  bits = bits.reshape(plane.shape[:-1] + (-1,))
+  return bits[..., :g_width].astype(np.uint8)
+#
+# shift_west(plane, g_width), shift_east(plane, g_width) -- return plane
+#
+def shift_west(plane, g_width):
+  """
+  Move every cell one step east, so that each cell holds the value
+  of its west neighbour (x - 1). The x axis wraps around.
+  """
+  last_word = int((g_width - 1) / word_size)
+  last_bit = np.uint64((g_width - 1) % word_size)
+  shifted = plane << one
+  shifted[..., 1:] |= plane[..., :-1] >> np.uint64(word_size - 1)
+  shifted[..., 0] |= (plane[..., last_word] >> last_bit) & one
+  shifted[..., last_word] &= ~np.uint64(0) >> (np.uint64(word_size - 1) - last_bit)
+  return shifted
+def shift_east(plane, g_width):
+  """
+  Move every cell one step west, so that each cell holds the value
+  of its east neighbour (x + 1). The x axis wraps around.
+  """
+  last_word = int((g_width - 1) / word_size)
+  last_bit = np.uint64((g_width - 1) % word_size)
+  shifted = plane >> one
+  shifted[..., :-1] |= plane[..., 1:] << np.uint64(word_size - 1)
+  shifted[..., last_word] |= (plane[..., 0] & one) << last_bit
+  return shifted
+#
+# add_bits(a, b) -- returns sum
+#
+def add_bits(a, b):
+  """
+  Add two numbers, given as lists of bit-planes (least significant
+  plane first), with a ripple-carry adder that works on 64 cells
+  per word at once.
+  """
+  if (len(a) < len(b)):
+    [a, b] = [b, a]
+  total = []
+  carry = None
+  for k in range(len(a)):
+    if (k < len(b)):
+      digit = a[k] ^ b[k]
+      new_carry = a[k] & b[k]
+    else:
+      digit = a[k]
+      new_carry = None
+    if (carry is not None):
+      if (new_carry is None):
+        new_carry = digit & carry
+      else:
+        new_carry = new_carry | (digit & carry)
+      digit = digit ^ carry
+    total.append(digit)
+    carry = new_carry
+  if (carry is not None):
+    total.append(carry)
+  return total
+#
+# count_plane_neighbours(plane, g_width) -- returns count bit-planes
+#
+def count_plane_neighbours(plane, g_width):
+  """
+  Count the ones in the Moore neighbourhood of every cell in a
+  plane. The count (0 to 8) is returned as four bit-planes, least
+  significant first.
+  """
+  west = shift_west(plane, g_width)
+  east = shift_east(plane, g_width)
+  # the sum of each cell and its west and east neighbours (0 to 3)
+  row3 = add_bits([west ^ east], [plane, west & east])[:2]
+  # the sum of the west and east neighbours only (0 to 2)
+  row2 = [west ^ east, west & east]
+  # the rows above and below (the y axis wraps around)
+  above = [np.roll(bits, 1, axis=-2) for bits in row3]
+  below = [np.roll(bits, -1, axis=-2) for bits in row3]
+  return add_bits(add_bits(above, below), row2)[:4]
+#
+# bitboard_step(alive, blue, g_width) -- returns [alive, blue]
+#
+def bitboard_step(alive, blue, g_width):
+  """
+  Apply one generation of the Immigration rule to a pair of
+  bit-planes. See immigration_step() for the rule.
+  """
+  [n0, n1, n2, n3] = count_plane_neighbours(alive, g_width)
+  # blue_count is only needed to decide whether a birth is blue:
+  # a birth is blue when 2 or 3 of its 3 neighbours are blue
+  blue_count = count_plane_neighbours(blue, g_width)
+  two_or_more_blue = blue_count[1] | blue_count[2] | blue_count[3]
+  two_or_three = n1 & ~(n2 | n3)
+  three = two_or_three & n0
+  survive = alive & two_or_three
+  birth = three & ~alive
+  new_alive = survive | birth
+  new_blue = (survive & blue) | (birth & two_or_more_blue)
+  return [new_alive, new_blue]
+#
+# bitboard_life_step(alive, g_width) -- returns alive
+#
+def bitboard_life_step(alive, g_width):
+  """
+  Apply one generation of 2-state Life to a bit-plane. See
+  life_step().
+  """
+  [n0, n1, n2, n3] = count_plane_neighbours(alive, g_width)
+  # 2 or 3 neighbours to survive, exactly 3 to be born
+  two_or_three = n1 & ~(n2 | n3)
+  return two_or_three & (n0 | alive)
+#
+# bitboard_rule_table() -- returns table
+#
+def bitboard_rule_table():
+  """
+  Make the rule table that bitboard_step() implements, by stepping
+  the centre cell of a 3 x 3 block for every possible neighbourhood.
+  """
+  table = np.zeros((3, 9, 9), dtype=np.uint8)
+  for centre in range(3):
+    for num_red in range(9):
+      for num_blue in range(9 - num_red):
+        states = [1] * num_red + [2] * num_blue
+        states = states + [0] * (8 - len(states))
+        block = np.array(states[:4] + [centre] + states[4:], \
+          dtype=np.uint8).reshape((3, 3))
+        # a 3 x 3 block on a 64-cell-wide toroid, so nothing wraps
+        cells = np.zeros((3, 64), dtype=np.uint8)
+        cells[:, 1:4] = block
+        [alive, blue] = bitboard_step(pack_plane(cells > 0), \
+          pack_plane(cells == 2), 64)
+        new_alive = unpack_plane(alive, 64)[1][2]
+        new_blue = unpack_plane(blue, 64)[1][2]
+        table[centre][num_red][num_blue] = new_alive + new_blue
+      # impossible neighbourhoods (more than 8 neighbours) keep their
+      # state, as in compile_rule_table()
+      for num_blue in range(9 - num_red, 9):
+        table[centre][num_red][num_blue] = centre
+  return table
+#
+# Make a class for the bitboard engine.
+#
+class BitboardEngine(ToroidEngine):
+  """
+  The toroid is stored as two bit-planes (see pack_plane()) and each
+  generation is computed with bitwise adders, 64 cells at a time.
+  The adders are wired for the Immigration rule, so the engine checks
+  that the compiled rule table (see rule_table()) still agrees with
+  them.
+  """
+  def __init__(self):
+    assert np.array_equal(rule_table(), bitboard_rule_table()), \
+      "Immigration.rule has changed; the bitboard engine cannot follow it."
+    ToroidEngine.__init__(self)
+  def set_board(self, board):
+    cells = np.transpose(board)
+    self.alive = pack_plane(cells > 0)
+    self.blue = pack_plane(cells == 2)
+  def get_board(self):
+    alive = unpack_plane(self.alive, self.g_width)
+    blue = unpack_plane(self.blue, self.g_width)
+    return np.transpose(alive + blue)
+  def step(self):
+    [self.alive, self.blue] = bitboard_step(self.alive, self.blue, \
+      self.g_width)
+  def count_pops(self):
+    count2 = popcount(self.blue)
+    count1 = popcount(self.alive) - count2
+    return [count1, count2]
+  def state_key(self):
+    return self.alive.tobytes() + self.blue.tobytes()
+  def pack_stack(self, boards):
+    cells = np.transpose(boards, (0, 2, 1))
+    self.stack_width = cells.shape[-1]
+    return [pack_plane(cells > 0), pack_plane(cells == 2)]
+  def step_stack(self, state):
+    return bitboard_step(state[0], state[1], self.stack_width)
+  def count_stack(self, state):
+    count2 = popcount_stack(state[1])
+    count1 = popcount_stack(state[0]) - count2
+    return np.stack([count1, count2], axis=1)
+  def life_stack(self, state):
+    return [state[0]]
+  def step_life_stack(self, state):
+    return [bitboard_life_step(state[0], self.stack_width)]
+  def count_life_stack(self, state):
+    return popcount_stack(state[0])
+#
+# Solo trajectories. Until two seeds come within reach of each other,
+# each one grows exactly as it would alone in an infinite plane of
+# dead cells (the rule never makes a cell alive with no live
+# neighbours). The solo cache remembers these solo trajectories, so
+# that a seed that plays many games (such as a new child, which plays
+# every member of the population) is only grown once. The trajectory
+# of a seed does not depend on the size of the toroid, so the cache
+# is keyed by the cells of the (rotated) seed alone.
+#
+class SoloCache:
+  """
+  A cache of solo trajectories. The trajectory of a seed is a list
+  of [x_offset, y_offset, block], one for each generation, where
+  block holds the live part of the seed after that many generations
+  and block[0][0] is at (x_offset, y_offset) relative to the seed's
+  original cell [0][0].
+  """
+  #
+  # __init__(self, max_cells) -- returns NULL
+  #
+  def __init__(self, max_cells):
+    self.max_cells = max_cells
+    self.trajectories = {}
+    self.num_cells = 0
+  #
+  # solo_state(self, cells, num_steps) -- returns [x_offset, y_offset, block]
+  #
+  def solo_state(self, cells, num_steps):
+    """
+    Return the state of the given cells after they have grown alone
+    for num_steps generations.
+    """
+    key = (cells.shape, cells.tobytes())
+    if (key in self.trajectories):
+      trajectory = self.trajectories[key]
+    else:
+      assert rule_table()[0][0][0] == 0, \
+        "Solo trajectories need a rule where empty space stays empty"
+      trajectory = [live_block(np.array(cells, dtype=np.uint8), 0, 0)]
+    while (len(trajectory) <= num_steps):
+      [x_offset, y_offset, block] = trajectory[-1]
+      # two cells of margin: one to grow into and one for neighbours
+      padded = np.pad(block, 2, "constant")
+      trajectory.append(live_block(padded_step(padded), \
+        x_offset - 1, y_offset - 1))
+      self.num_cells = self.num_cells + trajectory[-1][2].size
+    # forget everything else when the cache gets too big
+    if (self.num_cells > self.max_cells):
+      self.trajectories = {}
+      self.num_cells = sum([block.size for [x, y, block] in trajectory])
+    if (self.max_cells > 0):
+      self.trajectories[key] = trajectory
+    return trajectory[num_steps]
+#
+# live_block(block, x_offset, y_offset) -- returns [x_offset, y_offset, block]
+#
+def live_block(block, x_offset, y_offset):
+  """
+  Trim the dead rows and columns from the edges of a block of cells
+  whose corner [0][0] is at (x_offset, y_offset).
+  """
+  rows = np.flatnonzero(block.any(axis=1))
+  columns = np.flatnonzero(block.any(axis=0))
+  if (len(rows) == 0):
+    return [x_offset, y_offset, np.zeros((0, 0), dtype=np.uint8)]
+  block = block[rows[0]:(rows[-1] + 1), columns[0]:(columns[-1] + 1)]
+  return [x_offset + rows[0], y_offset + columns[0], block]
+#
+# circle_gap(start1, span1, start2, span2, size) -- returns gap
+#
+def circle_gap(start1, span1, start2, span2, size):
+  """
+  The distance between the nearest cells of two intervals of cells
+  on a circle of the given size (1 for neighbouring cells, 0 if the
+  intervals overlap).
+  """
+  forward = (start2 - start1) % size
+  backward = (start1 - start2) % size
+  if (forward < span1) or (backward < span2):
+    return 0
+  return min(forward - (span1 - 1), backward - (span2 - 1))
+#
+solo_cache = SoloCache(mparam.solo_cache_cells)
+#
+# Make a class for games.
+#
+class Game:
+  """
+  The starting position of one Immigration Game: the size of the
+  toroid, the number of generations to run, and the seeds that are
+  placed in the toroid. A list of games can be played together with
+  play_games().
+  """
+  #
+  # __init__(self, g_width, g_height, g_time) -- returns NULL
+  #
+  def __init__(self, g_width, g_height, g_time):
+    self.g_width = g_width
+    self.g_height = g_height
+    self.g_time = g_time
+    # a list of [cells, g_xstart, g_ystart], one for each seed
+    self.seeds = []
+  #
+  # add_seed(self, cells, g_xstart, g_ystart) -- returns NULL
+  #
+  def add_seed(self, cells, g_xstart, g_ystart):
+    """
+    Place the given cells with their corner [0][0] at the Golly
+    coordinate (g_xstart, g_ystart), as Seed.insert() would.
+    """
+    self.seeds.append([cells, g_xstart, g_ystart])
+  #
+  # solo_steps(self) -- returns number of generations
+  #
+  def solo_steps(self):
+    """
+    The number of generations before any two seeds could affect each
+    other. After k generations, a seed can only have changed cells
+    within k cells of where it started (in the Chebyshev distance
+    on the toroid), so two seeds whose nearest cells are gap cells
+    apart grow independently for (gap - 1) / 2 generations. A seed
+    must also stay clear of its own copy around the toroid.
+    """
+    if (solo_cache.max_cells == 0):
+      return 0
+    num_steps = self.g_time
+    for n in range(len(self.seeds)):
+      [cells1, g_xstart1, g_ystart1] = self.seeds[n]
+      [xspan1, yspan1] = cells1.shape
+      num_steps = min(num_steps, int((self.g_width - xspan1) / 2), \
+        int((self.g_height - yspan1) / 2))
+      for [cells2, g_xstart2, g_ystart2] in self.seeds[(n + 1):]:
+        [xspan2, yspan2] = cells2.shape
+        gap = max(circle_gap(g_xstart1, xspan1, g_xstart2, xspan2, \
+          self.g_width), circle_gap(g_ystart1, yspan1, g_ystart2, yspan2, \
+          self.g_height))
+        num_steps = min(num_steps, int((gap - 1) / 2))
+    return max(num_steps, 0)
+  #
+  # board(self, num_steps) -- returns board
+  #
+  def board(self, num_steps = 0):
+    """
+    Make the board [x][y] for the game after num_steps generations,
+    which must be no more than solo_steps(). The board is put together
+    from the solo trajectories of the seeds (see SoloCache).
+    """
+    board = np.zeros((self.g_width, self.g_height), dtype=np.uint8)
+    for [cells, g_xstart, g_ystart] in self.seeds:
+      if (num_steps == 0):
+        [x_offset, y_offset, block] = [0, 0, cells]
+      else:
+        [x_offset, y_offset, block] = solo_cache.solo_state(cells, num_steps)
+      [xspan, yspan] = block.shape
+      i = (g_xstart + x_offset + int(self.g_width / 2)) % self.g_width
+      j = (g_ystart + y_offset + int(self.g_height / 2)) % self.g_height
+      rows = np.arange(i, i + xspan) % self.g_width
+      columns = np.arange(j, j + yspan) % self.g_height
+      board[np.ix_(rows, columns)] = block
+    return board
+  #
+  # size(self) -- returns [g_width, g_height, g_time]
+  #
+  def size(self):
+    return [self.g_width, self.g_height, self.g_time]
+#
+# play_games(engine, games, max_batch_cells) -- returns counts
+#
+def play_games(engine, games, max_batch_cells):
+  """
+  Play a list of games and return the final populations of red and
+  blue for each game, in the same order as the games. The games are
+  sorted into buckets of equal toroid size and running time, and each
+  bucket is played as a stack of boards, [b][x][y], so that one NumPy
+  operation steps every game in the stack. A stack holds at most
+  max_batch_cells cells (but always at least one game), which limits
+  the memory used. Each stack starts from the solo trajectories of
+  its seeds, at the first generation where the seeds of any game in
+  the stack could meet (see Game.solo_steps()).
+  """
+  # sort the games into buckets by size
+  buckets = {}
+  solo_steps = []
+  for n in range(len(games)):
+    key = tuple(games[n].size())
+    if (key not in buckets):
+      buckets[key] = []
+    buckets[key].append(n)
+    solo_steps.append(games[n].solo_steps())
+  # play each bucket, in stacks of at most max_batch_cells
+  counts = [None] * len(games)
+  for key in sorted(buckets.keys()):
+    [g_width, g_height, g_time] = key
+    # put games with similar solo_steps in the same stack
+    members = sorted(buckets[key], key=lambda n: solo_steps[n])
+    stack_size = max(1, int(max_batch_cells / (g_width * g_height)))
+    for first in range(0, len(members), stack_size):
+      stack = members[first:(first + stack_size)]
+      num_steps = min([solo_steps[n] for n in stack])
+      boards = np.array([games[n].board(num_steps) for n in stack], \
+        dtype=np.uint8)
+      stack_counts = engine.run_batch(boards, g_time - num_steps)
+      for k in range(len(stack)):
+        counts[stack[k]] = [int(stack_counts[k][0]), int(stack_counts[k][1])]
+  return counts
+#
+# Make a class for recorded games.
+#
+class Recording:
+  """
+  A game (see Game) and the board after every one of its generations,
+  so that the game can be replayed, from any generation, without
+  playing it again. Every keyframe_interval generations, the whole
+  board is stored; in between, only the XOR of each board with the
+  board before it, which is mostly zeros. Each frame is compressed
+  with zlib. The populations of red and blue after each generation
+  are kept too. For a contest from score_pair(), seed_cells holds the
+  two seeds as they were before rotation, and orientations holds the
+  [rotation, flip] that turned each one into the seed in the game
+  (see find_orientation() in model_functions.py).
+  """
+  #
+  # __init__(self, game, keyframe_interval) -- returns NULL
+  #
+  def __init__(self, game, keyframe_interval):
+    self.game = game
+    self.keyframe_interval = keyframe_interval
+    self.frames = []
+    self.counts = []
+    self.seed_cells = []
+    self.orientations = []
+  #
+  # num_generations(self) -- returns the last generation recorded
+  #
+  def num_generations(self):
+    return len(self.frames) - 1
+  #
+  # board(self, generation) -- returns board
+  #
+  def board(self, generation):
+    """
+    The board [x][y] after the given generation: the keyframe at or
+    before it, with the changes of the following generations applied.
+    """
+    assert 0 <= generation <= self.num_generations()
+    shape = (self.game.g_width, self.game.g_height)
+    first = generation - (generation % self.keyframe_interval)
+    board = np.frombuffer(zlib.decompress(self.frames[first]), \
+      dtype=np.uint8).reshape(shape).copy()
+    for n in range(first + 1, generation + 1):
+      board ^= np.frombuffer(zlib.decompress(self.frames[n]), \
+        dtype=np.uint8).reshape(shape)
+    return board
+#
+# record_game(engine, game, keyframe_interval) -- returns recording
+#
+def record_game(engine, game, keyframe_interval):
+  """
+  Play a game one generation at a time with a headless engine and
+  record every board (see Recording).
+  """
+  recording = Recording(game, keyframe_interval)
+  [g_width, g_height, g_time] = game.size()
+  engine.setrule("Immigration:T" + str(g_width) + "," + str(g_height))
+  engine.set_board(game.board())
+  previous = None
+  for generation in range(g_time + 1):
+    if (generation > 0):
+      engine.run(1)
+    board = np.array(engine.get_board(), dtype=np.uint8)
+    if (generation % keyframe_interval == 0):
+      frame = board
+    else:
+      frame = board ^ previous
+    recording.frames.append(zlib.compress(frame.tobytes()))
+    recording.counts.append(engine.count_pops())
+    previous = board
+  return recording
+#
+# The engines that can be selected by name, with simulation_engine
+# in model_parameters.py. Each engine is made once and then reused.
+#
+engine_classes = {"numpy": DenseEngine, "bitboard": BitboardEngine, \
+  "tiled": TiledEngine, "sparse": SparseEngine, "jit": JitEngine}
+engine_cache = {}
+#
+# get_engine(engine_name) -- returns engine
+#
+def get_engine(engine_name):
+  """
+  Return the engine with the given name, making it if necessary.
+  """
+  assert engine_name in engine_classes, \
+    "Unknown simulation engine: " + str(engine_name)
+  if (engine_name not in engine_cache):
+    engine_cache[engine_name] = engine_classes[engine_name]()
+  return engine_cache[engine_name]
+#
+# Automatic engine selection. With simulation_engine = "auto", each
+# match is played by the engine that has been fastest so far for
+# matches like it. Matches are sorted into classes by the area of the
+# toroid and by the fraction of the toroid that is alive at the start
+# (both on a log2 scale). For each class and engine, the selection
+# table records the average time per cell per generation. Each engine
+# is tried a few times in each class before the table is trusted, but
+# an engine that was much slower than the others on smaller toroids is
+# not tried on bigger ones, where it would waste the most time. The
+# table is kept in a file (engine_timings.json), so what is learned in
+# one run is used in the next; score_pairs() in model_functions.py
+# saves it whenever it has changed. Only the headless engines are
+# chosen: Golly is never used by "auto", as it can only play one game
+# at a time and is not available outside Golly.
+#
+auto_engines = ["numpy", "bitboard", "tiled", "sparse"]
+if numba_available:
+  auto_engines.append("jit")
+timing_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), \
+  "engine_timings.json")
+selector_cache = []
+#
+# Make a class for the selection table.
+#
+class EngineSelector:
+  """
+  The selection table for automatic engine selection.
+  """
+  # number of timings needed before an engine is judged in a class
+  min_samples = 2
+  # weight of a new timing in the running average
+  smoothing = 0.2
+  # an engine that is more than this many times slower than the fastest
+  # in a class is not tried in the classes of bigger toroids
+  max_slowdown = 4.0
+  #
+  # __init__(self, path) -- returns NULL
+  #
+  def __init__(self, path):
+    self.path = path
+    # table[match_class][engine_name] = [seconds per cell step, samples]
+    self.table = {}
+    if os.path.exists(path):
+      try:
+        handle = open(path, "r")
+        self.table = json.load(handle)
+        handle.close()
+      except ValueError:
+        self.table = {} # a damaged table is simply relearned
+    # whether the table has changed since it was read or saved
+    self.changed = False
+  #
+  # match_class(self, g_width, g_height, num_live) -- returns key
+  #
+  def match_class(self, g_width, g_height, num_live):
+    area = float(g_width * g_height)
+    area_class = int(np.log2(area))
+    live_class = int(np.log2(area / max(num_live, 1.0)))
+    return str(area_class) + "," + str(live_class)
+  #
+  # candidates(self, key) -- returns engine_names
+  #
+  def candidates(self, key):
+    """
+    The engines that are worth trying for the matches in a class. The
+    classes with smaller toroids and the same density are taken in
+    order of size, and in each of them where every remaining engine
+    has been tried, the engines that were more than max_slowdown times
+    slower than the fastest are dropped. Thus the cost of trying every
+    engine is only paid in full on small toroids.
+    """
+    [area_class, live_class] = [int(part) for part in key.split(",")]
+    engine_names = auto_engines
+    for smaller in range(area_class):
+      timings = self.table.get(str(smaller) + "," + str(live_class), {})
+      samples = [timings.get(engine_name, [0.0, 0])[1] \
+        for engine_name in engine_names]
+      if (min(samples) < self.min_samples):
+        continue
+      fastest = min([timings[engine_name][0] for engine_name in engine_names])
+      engine_names = [engine_name for engine_name in engine_names \
+        if (timings[engine_name][0] <= self.max_slowdown * fastest)]
+    return engine_names
+  #
+  # choose(self, g_width, g_height, num_live) -- returns engine_name
+  #
+  def choose(self, g_width, g_height, num_live):
+    """
+    Choose the headless engine for a match on a g_width x g_height
+    toroid that starts with num_live live cells.
+    """
+    key = self.match_class(g_width, g_height, num_live)
+    timings = self.table.get(key, {})
+    engine_names = self.candidates(key)
+    # first make sure that every candidate has been tried
+    for engine_name in engine_names:
+      if (timings.get(engine_name, [0.0, 0])[1] < self.min_samples):
+        return engine_name
+    # then use the fastest
+    best_name = engine_names[0]
+    for engine_name in engine_names:
+      if (timings[engine_name][0] < timings[best_name][0]):
+        best_name = engine_name
+    return best_name
+  #
+  # record(self, engine_name, g_width, g_height, num_live, seconds, 
+  #   cell_steps) -- returns NULL
+  #
+  def record(self, engine_name, g_width, g_height, num_live, seconds, \
+    cell_steps):
+    """
+    Add a timing to the table: the engine took the given number of
+    seconds for the given number of cell steps (cells x generations).
+    """
+    key = self.match_class(g_width, g_height, num_live)
+    timings = self.table.setdefault(key, {})
+    rate = seconds / max(cell_steps, 1)
+    if (engine_name in timings):
+      [old_rate, samples] = timings[engine_name]
+      rate = old_rate + self.smoothing * (rate - old_rate)
+      timings[engine_name] = [rate, samples + 1]
+    else:
+      timings[engine_name] = [rate, 1]
+    self.changed = True
+  #
+  # save(self) -- returns NULL
+  #
+  def save(self):
+    """
+    Write the table to its file, if it has changed.
+    """
+    if (not self.changed):
+      return
+    try:
+      handle = open(self.path, "w")
+      json.dump(self.table, handle, indent=1, sort_keys=True, \
+        separators=(",", ": "))
+      handle.close()
+    except (IOError, OSError):
+      pass # the table file is optional
+    self.changed = False
+#
+# Approximate scoring. With early_stop = True in model_parameters.py,
+# a game stops early once one colour has led the other by more than
+# early_stop_margin (a fraction of all live cells) at early_stop_checks
+# checkpoints in a row, one checkpoint every early_stop_interval
+# generations, and the leader is taken as the winner. To measure the
+# cost in accuracy, a fraction early_stop_audit of these games are
+# played to the end anyway, and the statistics count how often the
+# final winner differs from the predicted winner. The audits are
+# chosen with a random generator of their own, so the random numbers
+# of the model are the same with and without early stopping.
+#
+stopper_cache = []
+#
+# Make a class for early stopping.
+#
+class EarlyStopper:
+  """
+  The settings and statistics for approximate scoring.
+  """
+  #
+  # __init__(self) -- returns NULL
+  #
+  def __init__(self):
+    self.margin = mparam.early_stop_margin
+    self.checks = mparam.early_stop_checks
+    self.interval = mparam.early_stop_interval
+    self.audit_fraction = mparam.early_stop_audit
+    if (mparam.random_seed >= 0):
+      self.random = random.Random(mparam.random_seed)
+    else:
+      self.random = random.Random()
+    self.num_games = 0
+    self.num_stopped = 0
+    self.num_audited = 0
+    self.num_flipped = 0
+    self.total_steps = 0
+    self.skipped_steps = 0
+    self.seconds = 0.0
+  #
+  # leaders(self, counts) -- returns leaders
+  #
+  def leaders(self, counts):
+    """
+    Given counts[b] = [count1, count2], return 1 for the boards where
+    red leads by more than the margin, 2 where blue does, and 0 for
+    the rest.
+    """
+    lead = counts[:, 0] - counts[:, 1]
+    total = counts[:, 0] + counts[:, 1]
+    leaders = np.zeros(len(counts), dtype=np.int64)
+    leaders[lead > self.margin * total] = 1
+    leaders[-lead > self.margin * total] = 2
+    return leaders
+  #
+  # audit(self) -- returns True if a game should be played to the end
+  #
+  def audit(self):
+    return (self.random.random() < self.audit_fraction)
+  #
+  # stop(self, steps_left) -- returns NULL
+  #
+  def stop(self, steps_left):
+    self.num_stopped = self.num_stopped + 1
+    self.skipped_steps = self.skipped_steps + steps_left
+  #
+  # record(self, counts, prediction, num_steps, seconds) -- returns NULL
+  #
+  def record(self, counts, prediction, num_steps, seconds):
+    """
+    Add some finished games to the statistics. The games that were
+    audited have a prediction (1 = red wins, 2 = blue wins) and the
+    rest have prediction 0.
+    """
+    winner = np.zeros(len(counts), dtype=np.int64)
+    winner[counts[:, 0] > counts[:, 1]] = 1
+    winner[counts[:, 1] > counts[:, 0]] = 2
+    audited = (prediction > 0)
+    self.num_games = self.num_games + len(counts)
+    self.num_audited = self.num_audited + int(np.sum(audited))
+    self.num_flipped = self.num_flipped + \
+      int(np.sum(audited & (winner != prediction)))
+    self.total_steps = self.total_steps + len(counts) * num_steps
+    self.seconds = self.seconds + seconds
+  #
+  # report(self) -- returns message
+  #
+  def report(self):
+    """
+    Summarize the statistics for the run log.
+    """
+    return "Early stopping: " + str(self.num_games) + " games, " + \
+      "{:.3f} stopped early, ".format(self.num_stopped / \
+      float(max(self.num_games, 1))) + \
+      "{:.3f} of generations skipped, ".format(self.skipped_steps / \
+      float(max(self.total_steps, 1))) + \
+      str(self.num_audited) + " audited, " + \
+      "{:.3f} of audited winners changed, ".format(self.num_flipped / \
+      float(max(self.num_audited, 1))) + \
+      "{:.1f} games per second\n".format(self.num_games / \
+      max(self.seconds, 1e-9))
+#
+# early_stopper() -- returns stopper
+#
+def early_stopper():
+  """
+  Return the statistics for approximate scoring, making them the
+  first time.
+  """
+  if (len(stopper_cache) == 0):
+    stopper_cache.append(EarlyStopper())
+  return stopper_cache[0]
+#
+# engine_selector() -- returns selector
+#
+def engine_selector():
+  """
+  Return the selection table, loading it from timing_path the first
+  time.
+  """
+  if (len(selector_cache) == 0):
+    selector_cache.append(EngineSelector(timing_path))
+  return selector_cache[0]
+#
+#
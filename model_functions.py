@@ -3,9 +3,9 @@ Model Functions
 
 Peter Turney, July 16, 2019
 """
-import golly as g
 import model_classes as mclass
 import model_parameters as mparam
+import model_engines as mengine
 import random as rand
 import numpy as np
 import copy
@@ -23,10 +23,14 @@ Various functions for working with Golly
 def show_message(g, log_handle, message):
   """
   A function for writing a message to both the Golly window
-  and the log file.
+  and the log file. Without Golly (g is None or a headless engine),
+  the message goes to the standard output instead of the window.
   """
   log_handle.write(message)
-  g.show(message)
+  if hasattr(g, "show"):
+    g.show(message)
+  else:
+    sys.stdout.write(message)
 #
 # set_mag(g) -- returns mag
 #
@@ -77,6 +81,16 @@ def get_minmax(g):
   # get height and width
   g_xspan = g.getwidth()
   g_yspan = g.getheight()
+  #
+  return toroid_minmax(g_xspan, g_yspan)
+#
+# toroid_minmax(g_xspan, g_yspan) -- returns [g_xmin, g_xmax, g_ymin, g_ymax]
+#
+def toroid_minmax(g_xspan, g_yspan):
+  """
+  Calculate the min and max of the coordinates of a Golly toroid
+  with the given width and height
+  """
   # calculate min and max
   g_xmin = - int(g_xspan / 2)
   g_xmax = g_xspan + g_xmin
@@ -85,25 +99,94 @@ def get_minmax(g):
   #
   return [g_xmin, g_xmax, g_ymin, g_ymax]
 #
+# Make a class for Golly sessions.
+#
+class GollySession:
+  """
+  Remembers how a Golly universe has been set up, so that the next
+  game on a toroid of the same size can reuse the universe: the cells
+  are cleared in place and the generation count is reset, instead of
+  making a new universe and setting the rule again. A headless session
+  (for scoring, where nothing is watched) never sets the magnification
+  or updates the view.
+  """
+  #
+  # __init__(self, g, headless) -- returns NULL
+  #
+  def __init__(self, g, headless):
+    self.g = g
+    self.headless = headless
+    self.algo = None
+    self.rule = None
+  #
+  # start(self, g_width, g_height) -- returns NULL
+  #
+  def start(self, g_width, g_height):
+    """
+    Give Golly an empty g_width x g_height toroid at generation 0.
+    """
+    g = self.g
+    rule = "Immigration:T" + str(g_width) + "," + str(g_height)
+    # Golly keeps its universe between scripts, and other code may
+    # have changed it, so check that it is still the one we set up
+    if (rule == self.rule) and (g.getrule() == rule) and \
+      (g.getalgo() == self.algo):
+      rect = g.getrect()
+      if (len(rect) > 0):
+        g.select(rect)
+        g.clear(0) # 0 = clear inside the selection
+        g.select([])
+      g.setgen("0")
+    else:
+      g.setalgo("QuickLife") # use "HashLife" or "QuickLife"
+      g.autoupdate(False) # do not update the view unless requested
+      g.new("Immigration") # initialize cells to state 0
+      g.setrule(rule) # make a toroid
+      self.algo = "QuickLife"
+      self.rule = rule
+    if (not self.headless):
+      g.setmag(set_mag(g))
+  #
+  # run(self, num_steps) -- returns NULL
+  #
+  def run(self, num_steps):
+    """
+    Run Golly for num_steps generations, and show the result unless
+    the session is headless.
+    """
+    self.g.run(num_steps)
+    if (not self.headless):
+      self.g.update()
+#
+# golly_session(g, headless) -- returns session
+#
+golly_sessions = {}
+#
+def golly_session(g, headless = True):
+  """
+  The session for the Golly universe g, made on the first call.
+  """
+  key = (id(g), headless)
+  if (key not in golly_sessions):
+    golly_sessions[key] = GollySession(g, headless)
+  return golly_sessions[key]
+#
 # count_pops(g) -- returns [count1, count2]
 #
 def count_pops(g):
   """
   Count the populations of state 1 (red) and state 2 (blue)
   """
-  # find the min and max of the Golly toroid coordinates
-  [g_xmin, g_xmax, g_ymin, g_ymax] = get_minmax(g)
-  #
-  count1 = 0
-  count2 = 0
-  #
-  for x in range(g_xmin, g_xmax):
-    for y in range(g_ymin, g_ymax):
-      a = g.getcell(x, y)
-      if (a == 1):
-        count1 = count1 + 1
-      if (a == 2):
-        count2 = count2 + 1
+  # headless engines (see model_engines.py) count their own populations
+  if hasattr(g, "count_pops"):
+    return g.count_pops()
+  # read all the live cells from Golly in one call, as a multi-state
+  # cell list [x1, y1, state1, ...] (perhaps with a padding 0 at the
+  # end, which the slice skips)
+  cells = g.getcells(g.getrect())
+  states = np.array(cells[2::3], dtype=np.int64)
+  count1 = int(np.count_nonzero(states == 1))
+  count2 = int(np.count_nonzero(states == 2))
   #
   return [count1, count2]
 #
@@ -115,7 +198,8 @@ def initialize_population(pop_size, s_xspan, s_yspan, seed_density):
   Randomly initialize the population of seeds.
   """
   #
-  # Initialize the population: a list of seeds.
+  # Initialize the population: a list of seeds, which is then
+  # made into a Population (see model_classes.py).
   #
   # Here a seed is an initial Game of Life pattern (it is
   # not a random number seed).
@@ -132,7 +216,7 @@ def initialize_population(pop_size, s_xspan, s_yspan, seed_density):
     # Add the seed to the population.
     population.append(seed) 
     #
-  return population
+  return mclass.Population(population)
 #
 # dimensions(s1, s2, width_factor, height_factor, time_factor)
 # -- returns [g_width, g_height, g_time]
@@ -165,17 +249,106 @@ def dimensions(s1, s2, width_factor, height_factor, time_factor):
   #
   return [g_width, g_height, g_time]
 #
+# get_backend(engine_name) -- returns g
+#
+def get_backend(engine_name = None):
+  """
+  The simulation backend for the Immigration Game. If engine_name is
+  None, use simulation_engine from model_parameters.py. Every backend
+  has the part of the Golly scripting interface that score_pair(),
+  Seed.insert() and count_pops() use (new, setrule, putcells, getcells,
+  run, and so on). The "golly" backend is the Golly module itself,
+  which is only imported here, so that the rest of the model can run
+  in a plain Python process. The other backends are the headless
+  engines in model_engines.py. With "auto", each match picks its own
+  engine (see choose_engine_name()), so the backend is the "numpy"
+  engine, for anything that needs a single universe.
+  """
+  if (engine_name is None):
+    engine_name = mparam.simulation_engine
+  if (engine_name == "golly"):
+    import golly
+    return golly
+  if (engine_name == "auto"):
+    engine_name = "numpy"
+  return mengine.get_engine(engine_name)
+#
+# count_live(seed1, seed2) -- returns number of live cells
+#
+def count_live(seed1, seed2):
+  """
+  The number of live cells in two seeds, from their densities.
+  """
+  area1 = seed1.xspan * seed1.yspan
+  area2 = seed2.xspan * seed2.yspan
+  return seed1.density() * area1 + seed2.density() * area2
+#
+# choose_engine_name(seed1, seed2, width_factor, height_factor, \
+#   time_factor, engine_name) -- returns engine_name
+#
+def choose_engine_name(seed1, seed2, width_factor, height_factor, \
+  time_factor, engine_name = None):
+  """
+  Decide which engine will play a match between seed1 and seed2.
+  If engine_name is None, use simulation_engine from model_parameters.py.
+  If it is "auto", use the engine that the selection table predicts
+  will be fastest, given the size of the toroid and the number of live
+  cells in the seeds (see EngineSelector in model_engines.py).
+  Otherwise the caller's choice stands.
+  """
+  if (engine_name is None):
+    engine_name = mparam.simulation_engine
+  if (engine_name != "auto"):
+    return engine_name
+  # rotations do not change the size of the toroid
+  [g_width, g_height, g_time] = dimensions(seed1, seed2, \
+    width_factor, height_factor, time_factor)
+  num_live = count_live(seed1, seed2)
+  return mengine.engine_selector().choose(g_width, g_height, num_live)
+#
+# record_timing(seed1, seed2, width_factor, height_factor, time_factor, \
+#   num_trials, engine_name, seconds) -- returns NULL
+#
+def record_timing(seed1, seed2, width_factor, height_factor, time_factor, \
+  num_trials, engine_name, seconds):
+  """
+  Tell the selection table that engine_name took the given number of
+  seconds to play num_trials games between seed1 and seed2.
+  """
+  [g_width, g_height, g_time] = dimensions(seed1, seed2, \
+    width_factor, height_factor, time_factor)
+  num_live = count_live(seed1, seed2)
+  cell_steps = g_width * g_height * g_time * num_trials
+  mengine.engine_selector().record(engine_name, g_width, g_height, \
+    num_live, seconds, cell_steps)
+#
 # score_pair(g, seed1, seed2, width_factor, height_factor, \
-#   time_factor, num_trials) -- returns [score1, score2]
+#   time_factor, num_trials, engine_name) -- returns [score1, score2]
 #
 def score_pair(g, seed1, seed2, width_factor, height_factor, \
-  time_factor, num_trials):
+  time_factor, num_trials, engine_name = None):
   """
   Put seed1 and seed2 into the Immigration Game g and see which 
   one wins and which one loses. Note that this function does
-  not update the histories of the seeds.
+  not update the histories of the seeds. The game is played by
+  Golly or by the headless engine named by engine_name (None means
+  simulation_engine in model_parameters.py). If g is None, the
+  backend comes from get_backend().
   """
   #
+  # The headless engines play all the trials together, starting
+  # each game from the solo trajectories of the seeds (see
+  # score_pairs()). The rest of this function plays the trials one
+  # at a time in Golly.
+  #
+  if (engine_name is None):
+    engine_name = mparam.simulation_engine
+  if (engine_name != "golly"):
+    return score_pairs(g, [[seed1, seed2]], width_factor, height_factor, \
+      time_factor, num_trials, engine_name)[0]
+  if (g is None):
+    g = get_backend(engine_name)
+  #
   # Make copies of the original two seeds, so that the following
   # manipulations do not change the originals.
   #
@@ -187,6 +360,10 @@ def score_pair(g, seed1, seed2, width_factor, height_factor, \
   score1 = 0.0
   score2 = 0.0
   #
+  # The Golly universe is reused from one trial (and match) to the next
+  #
+  session = golly_session(g)
+  #
   # Run several trials with different rotations and locations.
   #
   for trial in range(num_trials):
@@ -209,21 +386,15 @@ def score_pair(g, seed1, seed2, width_factor, height_factor, \
     [g_width, g_height, g_time] = dimensions(s1, s2, \
       width_factor, height_factor, time_factor)
     #
-    # set algorithm -- "HashLife" or "QuickLife"
+    # Clear the universe, or make a new one if the size has changed.
+    # Nothing is shown while scoring, so the session is headless.
     #
-    g.setalgo("QuickLife") # use "HashLife" or "QuickLife"
-    g.autoupdate(False) # do not update the view unless requested
-    g.new("Immigration") # initialize cells to state 0
-    g.setrule("Immigration:T" + str(g_width) + "," + str(g_height)) # make a toroid
+    session.start(g_width, g_height)
     #
     # Find the min and max of the Golly toroid coordinates
     #
     [g_xmin, g_xmax, g_ymin, g_ymax] = get_minmax(g)
     #
-    # Set magnification for Golly viewer
-    #
-    g.setmag(set_mag(g))
-    #
     # Randomly place seed s1 somewhere in the left s1de of the toroid
     #
     s1.insert(g, g_xmin, -1, g_ymin, g_ymax)
@@ -238,15 +409,15 @@ def score_pair(g, seed1, seed2, width_factor, height_factor, \
     # generations in an evolutionary sense. Generations in the 
     # Game of Life correspond to growth and decay of a phenotype,
     # whereas generations in evolution correspond to the reproduction
-    # of a genotype.
-    #
-    g.run(g_time) # run the Game of Life for g_time time steps
-    g.update() # need to update Golly to get counts
+    # of a genotype. Then count the populations of the two colours.
+    # State 1 = red = seed1. State 2 = blue = seed2.
     #
-    # Count the populations of the two colours. State 1 = red = seed1.
-    # State 2 = blue = seed2.
-    #
-    [count1, count2] = count_pops(g)
+    if (mparam.early_stop):
+      # approximate scoring (see EarlyStopper in model_engines.py)
+      [count1, count2] = run_early_stop(session, g_time)
+    else:
+      session.run(g_time) # run the Game of Life for g_time time steps
+      [count1, count2] = count_pops(g)
     #
     if (count1 > count2):
       score1 = score1 + 1.0
@@ -264,11 +435,377 @@ def score_pair(g, seed1, seed2, width_factor, height_factor, \
   #
   return [score1, score2]
 #
+# run_early_stop(session, g_time) -- returns [count1, count2]
+#
+def run_early_stop(session, g_time):
+  """
+  Run the game in a Golly session for g_time generations and count the
+  populations, but stop early once one colour has led for long
+  enough, as the headless engines do with early_stop = True (see
+  EarlyStopper in model_engines.py).
+  """
+  stopper = mengine.early_stopper()
+  start_time = time.time()
+  [leader, streak, prediction] = [0, 0, 0]
+  generation = 0
+  while (generation < g_time):
+    num_steps = min(stopper.interval, g_time - generation)
+    session.run(num_steps)
+    generation = generation + num_steps
+    [count1, count2] = count_pops(session.g)
+    if (generation == g_time):
+      break
+    new_leader = stopper.leaders(np.array([[count1, count2]]))[0]
+    if (new_leader > 0) and (new_leader == leader):
+      streak = streak + 1
+    else:
+      streak = int(new_leader > 0)
+    leader = new_leader
+    if (prediction == 0) and (streak >= stopper.checks):
+      if stopper.audit():
+        prediction = leader # play to the end, to check the prediction
+      else:
+        stopper.stop(g_time - generation)
+        break
+  stopper.record(np.array([[count1, count2]]), np.array([prediction]), \
+    g_time, time.time() - start_time)
+  return [count1, count2]
+#
+# make_games(seed1, seed2, width_factor, height_factor, time_factor, \
+#   num_trials) -- returns games
+#
+def make_games(seed1, seed2, width_factor, height_factor, time_factor, \
+  num_trials):
+  """
+  Set up the num_trials games that score_pair() would play between
+  seed1 and seed2, without playing them. The rotations and locations
+  are chosen with exactly the same calls to the random number
+  generator as score_pair() makes, so a run gives the same results
+  whether its games are played one by one or all together.
+  """
+  s1 = copy.deepcopy(seed1)
+  s2 = copy.deepcopy(seed2)
+  games = []
+  for trial in range(num_trials):
+    # rotate and flip, as in score_pair()
+    s1 = s1.random_rotate()
+    s2 = s2.random_rotate()
+    s2.red2blue()
+    [g_width, g_height, g_time] = dimensions(s1, s2, \
+      width_factor, height_factor, time_factor)
+    [g_xmin, g_xmax, g_ymin, g_ymax] = toroid_minmax(g_width, g_height)
+    # s1 goes in the left side and s2 goes in the right side
+    game = mengine.Game(g_width, g_height, g_time)
+    [g_xstart, g_ystart] = s1.random_location(g_xmin, -1, g_ymin, g_ymax)
+    game.add_seed(s1.cells, g_xstart, g_ystart)
+    [g_xstart, g_ystart] = s2.random_location(+1, g_xmax, g_ymin, g_ymax)
+    game.add_seed(s2.cells, g_xstart, g_ystart)
+    games.append(game)
+  return games
+#
+# find_orientation(cells0, cells) -- returns [rotation, flip]
+#
+def find_orientation(cells0, cells):
+  """
+  Find a [rotation, flip] that turns the seed cells0 into cells (ignoring
+  colour), the way random_rotate() does: rotate by 90 degrees times
+  rotation, then flip upside down if flip is 1. A symmetric seed has
+  more than one answer; the first one is returned.
+  """
+  for rotation in range(4):
+    for flip in range(2):
+      turned = np.rot90(cells0, rotation)
+      if (flip == 1):
+        turned = np.flipud(turned)
+      if (turned.shape == cells.shape) and \
+        np.array_equal(turned > 0, cells > 0):
+        return [rotation, flip]
+  assert False, "cells is not a rotation of cells0"
+#
+# record_contest(seed1, seed2, width_factor, height_factor, \
+#   time_factor, num_trials, engine_name) -- returns recordings
+#
+def record_contest(seed1, seed2, width_factor, height_factor, \
+  time_factor, num_trials, engine_name = "numpy"):
+  """
+  Record the num_trials games that score_pair() would play between
+  seed1 and seed2 (see make_games()), with the headless engine
+  engine_name, and return a list of recordings (see Recording in
+  model_engines.py), one for each trial, with the original seeds
+  and their orientations and placements.
+  """
+  engine = mengine.get_engine(engine_name)
+  recordings = []
+  for game in make_games(seed1, seed2, width_factor, height_factor, \
+    time_factor, num_trials):
+    recording = mengine.record_game(engine, game, mparam.keyframe_interval)
+    recording.seed_cells = [seed1.cells, seed2.cells]
+    recording.orientations = [find_orientation(recording.seed_cells[n], \
+      game.seeds[n][0]) for n in range(2)]
+    recordings.append(recording)
+  return recordings
+#
+# show_board(g, board) -- returns NULL
+#
+def show_board(g, board):
+  """
+  Write a whole board [x][y] into the Golly toroid, with board[0][0]
+  at (g_xmin, g_ymin), in one call to Golly.
+  """
+  [g_xmin, g_xmax, g_ymin, g_ymax] = get_minmax(g)
+  g.putcells(mclass.cell_list(board, g_xmin, g_ymin), \
+    0, 0, 1, 0, 0, 1, "copy")
+#
+# wilson_interval(successes, trials, z) -- returns [low, high]
+#
+def wilson_interval(successes, trials, z = 1.96):
+  """
+  The Wilson score interval for the probability of success, given
+  the number of successes in some trials. With z = 1.96, this is a
+  95% confidence interval. Unlike the usual p +/- z * stderr, it
+  stays within 0 and 1 and works for small counts.
+  """
+  if (trials == 0):
+    return [0.0, 1.0]
+  p = float(successes) / trials
+  denominator = 1.0 + z * z / trials
+  centre = (p + z * z / (2.0 * trials)) / denominator
+  margin = z * np.sqrt(p * (1.0 - p) / trials + \
+    z * z / (4.0 * trials * trials)) / denominator
+  return [max(0.0, centre - margin), min(1.0, centre + margin)]
+#
+# contest_rates(results) -- returns a line of text
+#
+def contest_rates(results):
+  """
+  Summarize a list of contest results (1 = red won, 2 = blue won,
+  0 = tie) as the rates of red wins, blue wins and ties, each with
+  a 95% confidence interval (see wilson_interval()).
+  """
+  num_contests = len(results)
+  parts = []
+  for [name, outcome] in [["red", 1], ["blue", 2], ["tie", 0]]:
+    count = results.count(outcome)
+    [low, high] = wilson_interval(count, num_contests)
+    parts.append(name + " {:.3f} ({:.3f} to {:.3f})".format( \
+      float(count) / max(num_contests, 1), low, high))
+  return "{:5d} contests: ".format(num_contests) + ", ".join(parts)
+#
+# game_steps(game) -- returns number of cell steps
+#
+def game_steps(game):
+  [g_width, g_height, g_time] = game.size()
+  return g_width * g_height * g_time
+#
+# score_pairs(g, seed_pairs, width_factor, height_factor, time_factor, \
+#   num_trials, engine_name) -- returns scores
+#
+def score_pairs(g, seed_pairs, width_factor, height_factor, time_factor, \
+  num_trials, engine_name = None):
+  """
+  Given a list of [seed1, seed2] pairs, return the list of 
+  [score1, score2] that score_pair() would give for each pair.
+  The headless engines play all of the games for all of the pairs
+  together (see play_games() in model_engines.py); Golly plays them
+  one at a time. With engine_name "auto", each pair goes to the
+  engine that choose_engine_name() picks for it.
+  """
+  if (engine_name is None):
+    engine_name = mparam.simulation_engine
+  # Golly cannot play more than one game at a time
+  if (engine_name == "golly"):
+    scores = []
+    for [seed1, seed2] in seed_pairs:
+      scores.append(score_pair(g, seed1, seed2, width_factor, \
+        height_factor, time_factor, num_trials, engine_name))
+    return scores
+  # set up all the games, in the same order as score_pair()
+  games = []
+  pair_engines = []
+  for [seed1, seed2] in seed_pairs:
+    games.extend(make_games(seed1, seed2, width_factor, height_factor, \
+      time_factor, num_trials))
+    pair_engines.append(choose_engine_name(seed1, seed2, width_factor, \
+      height_factor, time_factor, engine_name))
+  # play the games, each engine playing its own pairs together
+  counts = [None] * len(games)
+  for pair_engine in sorted(set(pair_engines)):
+    members = [p for p in range(len(seed_pairs)) \
+      if (pair_engines[p] == pair_engine)]
+    indices = [k for p in members \
+      for k in range(p * num_trials, (p + 1) * num_trials)]
+    start_time = time.time()
+    member_counts = mengine.play_games(mengine.get_engine(pair_engine), \
+      [games[k] for k in indices], mparam.max_batch_cells)
+    seconds = time.time() - start_time
+    for n in range(len(indices)):
+      counts[indices[n]] = member_counts[n]
+    # share the time among the pairs, in proportion to their work
+    if (engine_name == "auto"):
+      total_steps = sum([game_steps(games[k]) for k in indices])
+      for p in members:
+        [seed1, seed2] = seed_pairs[p]
+        pair_steps = sum([game_steps(games[k]) \
+          for k in range(p * num_trials, (p + 1) * num_trials)])
+        record_timing(seed1, seed2, width_factor, height_factor, \
+          time_factor, num_trials, pair_engine, \
+          seconds * pair_steps / max(total_steps, 1))
+  # keep what was learned, even if the run is short
+  if (engine_name == "auto"):
+    mengine.engine_selector().save()
+  # calculate the scores for each pair, as in score_pair()
+  scores = []
+  for p in range(len(seed_pairs)):
+    score1 = 0.0
+    score2 = 0.0
+    for [count1, count2] in counts[(p * num_trials):((p + 1) * num_trials)]:
+      if (count1 > count2):
+        score1 = score1 + 1.0
+      elif (count2 > count1):
+        score2 = score2 + 1.0
+      else:
+        score1 = score1 + 0.5
+        score2 = score2 + 0.5
+    scores.append([score1 / num_trials, score2 / num_trials])
+  return scores
+#
+# read_board(g) -- returns board
+#
+def read_board(g):
+  """
+  Read the whole toroid into an array board[x][y], where board[0][0]
+  is the cell at (g_xmin, g_ymin).
+  """
+  # the headless engines store their boards in the same order
+  if hasattr(g, "get_board"):
+    return np.array(g.get_board(), dtype=np.uint8)
+  [g_xmin, g_xmax, g_ymin, g_ymax] = get_minmax(g)
+  board = np.zeros((g_xmax - g_xmin, g_ymax - g_ymin), dtype=np.uint8)
+  cells = g.getcells(g.getrect())
+  num_cells = int(len(cells) / 3)
+  triples = np.array(cells[:3 * num_cells], \
+    dtype=np.int64).reshape((num_cells, 3))
+  board[triples[:, 0] - g_xmin, triples[:, 1] - g_ymin] = triples[:, 2]
+  return board
+#
+# trace_game(g, game, every_step) -- returns [counts, board]
+#
+def trace_game(g, game, every_step):
+  """
+  Play a game from make_games() in g, which may be Golly or one of
+  the headless engines. If every_step is True, run one generation
+  at a time and record [count1, count2] after each generation;
+  otherwise run all the generations at once, as score_pair() does,
+  and record only the final [count1, count2]. Return the list of
+  counts and the final board (see read_board()).
+  """
+  [g_width, g_height, g_time] = game.size()
+  g.setalgo("QuickLife")
+  g.autoupdate(False)
+  g.new("Immigration")
+  g.setrule("Immigration:T" + str(g_width) + "," + str(g_height))
+  for [cells, g_xstart, g_ystart] in game.seeds:
+    g.putcells(mclass.cell_list(cells, g_xstart, g_ystart), \
+      0, 0, 1, 0, 0, 1, "copy")
+  counts = []
+  if (every_step):
+    for step in range(g_time):
+      g.run(1)
+      g.update()
+      counts.append(count_pops(g))
+  else:
+    g.run(g_time)
+    g.update()
+    counts.append(count_pops(g))
+  return [counts, read_board(g)]
+#
+# first_divergence(reference, trace) -- returns step number
+#
+def first_divergence(reference, trace):
+  """
+  Compare two results [counts, board] from trace_game() and return
+  the first generation (counting from 1) where the counts differ.
+  If the counts agree but the final boards differ, return the last
+  generation. If they agree completely, return 0.
+  """
+  [ref_counts, ref_board] = reference
+  [counts, board] = trace
+  for step in range(len(ref_counts)):
+    if (step >= len(counts)) or (counts[step] != ref_counts[step]):
+      return step + 1
+  if (ref_board.shape != board.shape) or (not np.array_equal(ref_board, board)):
+    return len(ref_counts)
+  return 0
+#
+# play_contest(g, g_time, fps) -- returns NULL
+#
+def play_contest(g, g_time, fps):
+  """
+  Show a contest in Golly, running it up to generation g_time. The
+  view is updated about fps times a second: before each frame, the
+  number of generations to run is chosen from the measured speed of
+  Golly, so that running them takes about one frame. Keys:
+  space = pause or resume, f = fast-forward to the end, g = go to
+  a chosen generation (and pause there). Golly gives the same final
+  board however the generations are split into runs.
+  """
+  frame_seconds = 1.0 / fps
+  num_steps = 1 # generations per frame
+  paused = False
+  stop_gen = g_time # run without stopping until this generation
+  while (int(g.getgen()) < g_time):
+    event = g.getevent()
+    if event.startswith("key"):
+      key = event.split()[1]
+      if (key == "space"):
+        paused = not paused
+      elif (key == "f"):
+        [paused, stop_gen] = [False, g_time]
+        num_steps = g_time # one run to the end
+      elif (key == "g"):
+        answer = g.getstring("Go to generation (" + g.getgen() + \
+          " to " + str(g_time) + "):", str(g_time), "Go to generation")
+        if re.match(r"^\d+$", answer.strip()):
+          stop_gen = max(int(g.getgen()), min(int(answer), g_time))
+          paused = False
+          num_steps = g_time # as fast as possible, then pause
+    if (paused):
+      time.sleep(frame_seconds) # wait for the next key
+      continue
+    steps = min(num_steps, stop_gen - int(g.getgen()))
+    start_time = time.time()
+    g.run(steps)
+    run_seconds = time.time() - start_time
+    g.update()
+    # aim for one frame of running, at the speed just measured
+    if (num_steps < g_time):
+      rate = steps / max(run_seconds, 1e-6)
+      num_steps = max(1, int(rate * frame_seconds))
+    if (int(g.getgen()) == stop_gen) and (stop_gen < g_time):
+      [paused, stop_gen] = [True, g_time]
+      num_steps = 1
+      g.show("Paused at generation " + g.getgen() + \
+        ". Press space to resume.")
+  g.update()
+#
+# set_score(pop, i, j, score) -- returns NULL
+#
+def set_score(pop, i, j, score):
+  """
+  Record the score of the i-th seed against the j-th seed, in a
+  Population (which keeps its fitness totals up to date) or in a
+  plain list of seeds.
+  """
+  if isinstance(pop, mclass.Population):
+    pop.set_score(i, j, score)
+  else:
+    pop[i].history[j] = score
+#
 # update_history(g, pop, i, j, width_factor, height_factor, \
-#   time_factor, num_trials) -- returns NULL
+#   time_factor, num_trials, engine_name) -- returns NULL
 #
 def update_history(g, pop, i, j, width_factor, height_factor, \
-  time_factor, num_trials):
+  time_factor, num_trials, engine_name = None):
   """
   Put the i-th and j-th seeds into the Immigration Game g and
   see which one wins and which one loses. The history of the 
@@ -278,18 +815,55 @@ def update_history(g, pop, i, j, width_factor, height_factor, \
   # If i == j, let's just call it a tie.
   #
   if (i == j):
-    pop[i].history[i] = 0.5
+    set_score(pop, i, i, 0.5)
     return
   #
   # Call score_pair()
   #
   [scorei, scorej] = score_pair(g, pop[i], pop[j], width_factor, \
-    height_factor, time_factor, num_trials)
+    height_factor, time_factor, num_trials, engine_name)
   #
   # Update pop[i] and pop[j] with the new scores. 
   #
-  pop[i].history[j] = scorei
-  pop[j].history[i] = scorej
+  set_score(pop, i, j, scorei)
+  set_score(pop, j, i, scorej)
+  # 
+  # returns NULL
+  # 
+#
+# update_history_pairs(g, pop, pairs, width_factor, height_factor, \
+#   time_factor, num_trials, engine_name) -- returns NULL
+#
+def update_history_pairs(g, pop, pairs, width_factor, height_factor, \
+  time_factor, num_trials, engine_name = None):
+  """
+  Call update_history() for each [i, j] in the list pairs, but play
+  all of the games together, with score_pairs(). The results are the
+  same as calling update_history() for each pair in turn.
+  """
+  #
+  # If i == j, let's just call it a tie.
+  #
+  contests = []
+  for [i, j] in pairs:
+    if (i == j):
+      set_score(pop, i, i, 0.5)
+    else:
+      contests.append([i, j])
+  #
+  # Score all the other pairs together.
+  #
+  seed_pairs = [[pop[i], pop[j]] for [i, j] in contests]
+  scores = score_pairs(g, seed_pairs, width_factor, height_factor, \
+    time_factor, num_trials, engine_name)
+  #
+  # Update pop[i] and pop[j] with the new scores. 
+  #
+  for k in range(len(contests)):
+    [i, j] = contests[k]
+    [scorei, scorej] = scores[k]
+    set_score(pop, i, j, scorei)
+    set_score(pop, j, i, scorej)
   # 
   # returns NULL
   # 
@@ -317,6 +891,37 @@ def update_similarity(pop, i, j):
   # returns NULL
   # 
 #
+# fitness_vector(sample) -- returns fitness of each seed
+#
+def fitness_vector(sample):
+  """
+  The fitness of each seed in sample, which is either a Population,
+  whose fitness vector comes from its history matrix in one NumPy
+  operation, or a list of seeds.
+  """
+  if isinstance(sample, mclass.Population):
+    return sample.fitness_vector()
+  return np.array([seed.fitness() for seed in sample], dtype=np.float)
+#
+# update_similarities(pop, i) -- returns NULL
+#
+def update_similarities(pop, i):
+  """
+  Update the similarities between the i-th seed and every seed in
+  pop, as update_similarity() would for each of them. A Population
+  compares the seed with all the seeds of the same shape at once.
+  Only sexual and symbiotic reproduction (experiment types 3 and 4)
+  use similarities, so otherwise nothing is done (see
+  track_similarities in model_parameters.py).
+  """
+  if (not mparam.track_similarities):
+    return
+  if isinstance(pop, mclass.Population):
+    pop.update_similarities(i)
+  else:
+    for j in range(len(pop)):
+      update_similarity(pop, i, j)
+#
 # find_top_seeds(population, sample_size) -- returns sample_pop
 #
 def find_top_seeds(population, sample_size):
@@ -326,19 +931,16 @@ def find_top_seeds(population, sample_size):
   pop_size = len(population)
   assert pop_size > sample_size
   assert sample_size > 0
+  # a Population finds its top seeds without sorting all of them
+  if isinstance(population, mclass.Population):
+    return [population[i] for i in population.top_addresses(sample_size)]
   # calculate fitness for each seed in the population, from their history
-  scored_pop = []
-  for i in range(pop_size):
-    item = [population[i].fitness(), population[i]]
-    scored_pop.append(item)
-  # sort population in order of decreasing fitness (reverse=True)
-  scored_pop.sort(key = lambda x: x[0], reverse=True) # sort by fitness
-  # take the top sample_size items from scored_pop and
-  # remove their attached fitness numbers
-  sample_pop = []
-  for i in range(sample_size):
-    sample_pop.append(scored_pop[i][1]) # drop fitness number
-  # return the cleaned-up list of sample_size seeds
+  fitness = fitness_vector(population)
+  # sort population in order of decreasing fitness; the sort is stable,
+  # so seeds with equal fitness stay in order of address
+  order = np.argsort(-fitness, kind="mergesort")
+  # take the top sample_size seeds
+  sample_pop = [population[i] for i in order[:sample_size]]
   return sample_pop
 #
 # random_sample(population, sample_size) -- returns sample_pop
@@ -355,6 +957,18 @@ def random_sample(population, sample_size):
   pop_size = len(population)
   assert pop_size > sample_size
   assert sample_size > 0
+  # with fast_sampling, draw sample_size different addresses, in
+  # O(sample_size) time; this uses the random number generator
+  # differently, so runs are not the same as without fast_sampling
+  if (mparam.fast_sampling):
+    chosen = []
+    chosen_set = set()
+    while (len(chosen) < sample_size):
+      i = rand.randrange(pop_size)
+      if (i not in chosen_set):
+        chosen.append(i)
+        chosen_set.add(i)
+    return [population[i] for i in chosen]
   # attach a random number to each seed in the population
   randomized_pop = []
   for i in range(pop_size):
@@ -380,13 +994,10 @@ def find_best_seed(sample):
   """
   sample_size = len(sample)
   assert sample_size > 0
-  best_seed = sample[0]
-  best_score = best_seed.fitness()
-  for i in range(len(sample)):
-    if (sample[i].fitness() > best_score):
-      best_seed = sample[i]
-      best_score = best_seed.fitness()
-  return best_seed
+  if isinstance(sample, mclass.Population):
+    return sample[sample.best_address()]
+  # argmax returns the first of any ties
+  return sample[int(np.argmax(fitness_vector(sample)))]
 #
 # find_worst_seed(sample) -- returns worst_seed
 #
@@ -397,13 +1008,10 @@ def find_worst_seed(sample):
   """
   sample_size = len(sample)
   assert sample_size > 0
-  worst_seed = sample[0]
-  worst_score = worst_seed.fitness()
-  for i in range(len(sample)):
-    if (sample[i].fitness() < worst_score):
-      worst_seed = sample[i]
-      worst_score = worst_seed.fitness()
-  return worst_seed
+  if isinstance(sample, mclass.Population):
+    return sample[sample.worst_address()]
+  # argmin returns the first of any ties
+  return sample[int(np.argmin(fitness_vector(sample)))]
 #
 # average_fitness(sample) -- returns average
 #
@@ -414,10 +1022,7 @@ def average_fitness(sample):
   """
   sample_size = len(sample)
   assert sample_size > 0
-  total_fitness = 0.0
-  for i in range(len(sample)):
-    total_fitness = total_fitness + sample[i].fitness()
-  average = total_fitness / sample_size
+  average = np.sum(fitness_vector(sample)) / sample_size
   return average
 #
 # archive_elite(population, elite_size, log_directory, log_name, run_id_number) 
@@ -430,6 +1035,11 @@ def archive_elite(population, elite_size, log_directory, log_name, run_id_number
   most fit seeds in the current population.
   """
   history_sample = find_top_seeds(population, elite_size)
+  # the elite always has its similarities, for measure_similarities.py
+  if (not mparam.track_similarities) and \
+    isinstance(population, mclass.Population):
+    for seed in history_sample:
+      population.update_similarities(seed.address)
   history_name = log_name + "-pickle-" + str(run_id_number)
   history_path = log_directory + "/" + history_name + ".bin"
   history_handle = open(history_path, "wb") # wb = write binary
@@ -451,13 +1061,8 @@ def similarity(seed0, seed1):
     return 0.0
   if (seed0.yspan != seed1.yspan):
     return 0.0
-  # Initialize count.
-  num_agree = 0.0
   # Count agreements.
-  for x in range(seed0.xspan):
-    for y in range(seed0.yspan):
-      if (seed0.cells[x][y] == seed1.cells[x][y]):
-        num_agree = num_agree + 1.0
+  num_agree = float(np.count_nonzero(seed0.cells == seed1.cells))
   # Calculate a similarity score ranging from zero to one.
   similarity = num_agree / (seed0.xspan * seed0.yspan)
   # Return the degree of similarity between the two seeds.
@@ -473,12 +1078,11 @@ def find_similar_seeds(target_seed, pop, min_similarity, max_similarity):
   This function assumes that target_seed is in the population and
   the list target_seed.similarities is up-to-date. 
   """
-  similar_seeds = []
-  for i in range(len(pop)):
-    if ((target_seed.similarities[i] >= min_similarity) and \
-      (target_seed.similarities[i] <= max_similarity) and \
-      (target_seed.address != i)):
-      similar_seeds.append(pop[i])
+  similarities = target_seed.similarities
+  similar = (similarities >= min_similarity) & \
+    (similarities <= max_similarity)
+  similar[target_seed.address] = False
+  similar_seeds = [pop[i] for i in np.nonzero(similar)[0]]
   # return the seeds that satisfy the conditions
   return similar_seeds
 #
@@ -516,23 +1120,19 @@ def mate(seed0, seed1):
     # at least one row on either side of the split point.
     assert yspan > 1
     y_split_point = rand.randrange(yspan - 1)
-    for x in range(xspan):
-      for y in range(yspan):
-        if (y <= y_split_point):
-          child_seed.cells[x][y] = s0.cells[x][y]
-        else:
-          child_seed.cells[x][y] = s1.cells[x][y]
+    child_seed.cells[:, :(y_split_point + 1)] = \
+      s0.cells[:, :(y_split_point + 1)]
+    child_seed.cells[:, (y_split_point + 1):] = \
+      s1.cells[:, (y_split_point + 1):]
   else:
     # Choose the X axis split point. There will always be
     # at least one column on either side of the split point.
     assert xspan > 1
     x_split_point = rand.randrange(xspan - 1)
-    for x in range(xspan):
-      for y in range(yspan):
-        if (x <= x_split_point):
-          child_seed.cells[x][y] = s0.cells[x][y]
-        else:
-          child_seed.cells[x][y] = s1.cells[x][y]
+    child_seed.cells[:(x_split_point + 1), :] = \
+      s0.cells[:(x_split_point + 1), :]
+    child_seed.cells[(x_split_point + 1):, :] = \
+      s1.cells[(x_split_point + 1):, :]
   # Return the resulting child.
   return child_seed
 #
@@ -573,10 +1173,10 @@ def uniform_asexual(candidate_seed, pop, n):
   time_factor = mparam.time_factor
   num_trials = mparam.num_trials
   pop_size = len(pop)
-  for j in range(pop_size):
-    update_history(g, pop, i, j, width_factor, height_factor, \
-      time_factor, num_trials)
-    update_similarity(pop, i, j)
+  pairs = [[i, j] for j in range(pop_size)]
+  update_history_pairs(get_backend(), pop, pairs, width_factor, \
+    height_factor, time_factor, num_trials)
+  update_similarities(pop, i)
   # Report on the new history of the new seed
   message = "Run: {}".format(n) + \
     "  Parent fitness (s0): {:.3f}".format(s0.fitness()) + \
@@ -635,10 +1235,10 @@ def variable_asexual(candidate_seed, pop, n, max_seed_area):
   time_factor = mparam.time_factor
   num_trials = mparam.num_trials
   pop_size = len(pop)
-  for j in range(pop_size):
-    update_history(g, pop, i, j, width_factor, height_factor, \
-      time_factor, num_trials)
-    update_similarity(pop, i, j)
+  pairs = [[i, j] for j in range(pop_size)]
+  update_history_pairs(get_backend(), pop, pairs, width_factor, \
+    height_factor, time_factor, num_trials)
+  update_similarities(pop, i)
   # Report on the new history of the new seed
   message = "Run: {}".format(n) + \
     "  Parent fitness (s0): {:.3f}".format(s0.fitness()) + \
@@ -712,10 +1312,10 @@ def sexual(candidate_seed, pop, n, max_seed_area):
   time_factor = mparam.time_factor
   num_trials = mparam.num_trials
   pop_size = len(pop)
-  for j in range(pop_size):
-    update_history(g, pop, i, j, width_factor, height_factor, \
-      time_factor, num_trials)
-    update_similarity(pop, i, j)
+  pairs = [[i, j] for j in range(pop_size)]
+  update_history_pairs(get_backend(), pop, pairs, width_factor, \
+    height_factor, time_factor, num_trials)
+  update_similarities(pop, i)
   # Report on the new history of the new seed
   message = "Run: {}".format(n) + \
     "  Parent 0 fitness (s0): {:.3f}".format(s0.fitness()) + \
@@ -760,13 +1360,9 @@ def fusion(candidate_seed, pop, n, max_seed_area):
     return sexual(candidate_seed, pop, n, max_seed_area)
   # Copy s2 into the left side of s4.
   s4 = mclass.Seed(xspan, yspan, pop_size) # cells initialized to zero
-  for x in range(s2.xspan):
-    for y in range(s2.yspan):
-      s4.cells[x][y] = s2.cells[x][y]
+  s4.cells[:s2.xspan, :s2.yspan] = s2.cells
   # Copy s3 into the right side of s4.
-  for x in range(s3.xspan):
-    for y in range(s3.yspan):
-      s4.cells[x + s2.xspan + 1][y] = s3.cells[x][y]
+  s4.cells[(s2.xspan + 1):, :s3.yspan] = s3.cells
   # Find the least fit old seed in the population. It's not a problem
   # if there are ties.
   s5 = find_worst_seed(pop)
@@ -793,10 +1389,10 @@ def fusion(candidate_seed, pop, n, max_seed_area):
   height_factor = mparam.height_factor
   time_factor = mparam.time_factor
   num_trials = mparam.num_trials
-  for j in range(pop_size):
-    update_history(g, pop, i, j, width_factor, height_factor, \
-      time_factor, num_trials)
-    update_similarity(pop, i, j)
+  pairs = [[i, j] for j in range(pop_size)]
+  update_history_pairs(get_backend(), pop, pairs, width_factor, \
+    height_factor, time_factor, num_trials)
+  update_similarities(pop, i)
   # Report on the new history of the new seed.
   message = "Run: {}".format(n) + \
     "  Seed 0 fitness (s0): {:.3f}".format(s0.fitness()) + \
@@ -878,10 +1474,10 @@ def fission(candidate_seed, pop, n, max_seed_area):
   time_factor = mparam.time_factor
   num_trials = mparam.num_trials
   pop_size = len(pop)
-  for j in range(pop_size):
-    update_history(g, pop, i, j, width_factor, height_factor, \
-      time_factor, num_trials)
-    update_similarity(pop, i, j)
+  pairs = [[i, j] for j in range(pop_size)]
+  update_history_pairs(get_backend(), pop, pairs, width_factor, \
+    height_factor, time_factor, num_trials)
+  update_similarities(pop, i)
   # Report on the new history of the new seed
   message = "Run: {}".format(n) + \
     "  Whole fitness (s0): {:.3f}".format(s0.fitness()) + \
@@ -48,6 +48,109 @@ pop_size = 200
 #
 num_trials = 2
 #
+# The simulation engine that plays the Immigration Game:
+#
+# "golly" = the Golly universe (requires running inside Golly)
+# "numpy" = a headless NumPy engine (see model_engines.py)
+# "bitboard" = a headless engine that packs 64 cells into each word
+# "tiled" = a headless engine that only steps the active parts of the toroid
+# "sparse" = a headless engine that only stores the live cells
+# "jit" = a headless engine compiled with Numba, if it is installed
+#         (otherwise the same as "numpy")
+# "auto" = for each match, the headless engine that has been fastest
+#          for matches of similar size and density (see engine_timings.json);
+#          "golly" is never chosen
+#
+# The engines give the same results; the headless engines can run
+# without Golly, for example on a compute node with only Python and
+# Numpy.
+#
+simulation_engine = "golly"
+#
+# The headless engines can play many games at once, as one stack of
+# boards. This limits the number of cells in one stack (and thus the
+# memory used). Golly plays one game at a time.
+#
+max_batch_cells = 4000000
+#
+# The headless engines watch for games that settle into a still life
+# or a cycle, and then skip ahead to the final generation. This is the
+# longest cycle period that is detected (0 = no cycle detection). The
+# results are the same with or without cycle detection.
+#
+cycle_window = 32
+#
+# A colour that has died out can never come back, so once red or blue
+# is gone, the headless engines play the rest of the game as 2-state
+# Life, which is cheaper. This is how often (in generations) they look
+# for a dead colour (0 = never). The results are the same either way.
+#
+extinction_interval = 8
+#
+# The size of the square tiles of the "tiled" engine. Only tiles near
+# recent changes are stepped, so the work follows the active area
+# rather than the whole toroid.
+#
+tile_size = 16
+#
+# Batching does little for games on huge toroids (as in
+# compare_human.py). The "numpy" engine splits each such board, alone
+# or in a stack, into stripes and steps the stripes on num_threads
+# threads (1 = no threads; set this to the number of cores), and the
+# "tiled" engine splits its active tiles among the threads. Only
+# boards with at least min_stripe_cells cells (active cells, for
+# "tiled") are split.
+#
+num_threads = 1
+min_stripe_cells = 1000000
+#
+# Approximate scoring, for exploratory runs. With early_stop = True,
+# a game stops early once one colour has led the other by more than
+# early_stop_margin (as a fraction of all live cells) at
+# early_stop_checks checkpoints in a row, one checkpoint every
+# early_stop_interval generations, and the leader wins. A fraction
+# early_stop_audit of these games are played to the end anyway, to
+# measure how often stopping early picks the wrong winner; the run
+# log reports this rate and the number of games per second.
+#
+early_stop = False
+early_stop_margin = 0.5
+early_stop_checks = 3
+early_stop_interval = 20
+early_stop_audit = 0.05
+#
+# Until two seeds come close enough to affect each other, each one
+# grows as if it were alone. The headless engines remember how each
+# (rotated) seed grows alone and start each game at the first
+# generation where the seeds might meet. This limits the number of
+# cells that are remembered (0 = remember nothing). The results are
+# the same either way.
+#
+solo_cache_cells = 50000000
+#
+# view_contest.py and view_human.py show a contest at playback_fps
+# frames per second. Between frames, they run as many generations as
+# Golly can run in the time of one frame, so big contests play back
+# at full speed, without drawing frames that nobody could see.
+#
+playback_fps = 30
+#
+# A recorded contest (see Recording in model_engines.py) stores the
+# whole board every keyframe_interval generations and only the
+# changes in between. Smaller values make seeking faster and the
+# recordings bigger.
+#
+keyframe_interval = 50
+#
+# Tournament samples are drawn by giving every seed a random number
+# and sorting the population. With fast_sampling = True, they are
+# drawn directly, which takes time in proportion to the size of the
+# sample rather than the size of the population. This changes the
+# random numbers, so a run with the same random_seed will not be the
+# same as before; keep it False to repeat earlier experiments.
+#
+fast_sampling = False
+#
 # run_length: the number of children born in one run. Each child that
 # is born will replace an existing member of the population, so the
 # size of the population is constant.
@@ -148,6 +251,13 @@ elite_size = 50
 min_similarity = 0.80
 max_similarity = 0.99
 #
+# Only sexual and symbiotic reproduction (types 3 and 4) use the
+# similarities between seeds, so they are only kept up to date for
+# these types. The elite that is archived after each generation always
+# has its similarities, for measure_similarities.py.
+#
+track_similarities = (experiment_type_num in [3, 4])
+#
 # For symbiosis, set the probabilities of fission and fusion.
 # Because fusion can result in large seeds, which will slow down 
 # the simulation, the probability of fusion should be relatively 
@@ -0,0 +1,66 @@
+#
+# Record Contest
+#
+# Select two seeds from pickles and record the games that score_pair()
+# would play between them, for replay with view_replay.py.
+#
+import golly as g
+import model_functions as mfunc
+import model_parameters as mparam
+import random as rand
+import time
+import pickle
+import os
+#
+# Open a dialog window and ask the user to select two pickles.
+#
+g.note("Record Contest\n\n" + \
+  "You will be presented with three dialog menus:\n" + \
+  "     (1) Select a file of pickled seeds.\n" + \
+  "     (2) Select another file of pickled seeds.\n" + \
+  "     (3) Choose a name for the recording.\n" + \
+  "Two seeds, chosen randomly from each pickle, will then compete,\n" + \
+  "with num_trials rotations and placements, as in score_pair().\n" + \
+  "Every generation of every game is recorded.")
+#
+path1 = g.opendialog("Select the first pickled seed file (*.bin)", \
+  "(*.bin)|*.bin", g.getdir("app"))
+path2 = g.opendialog("Select the second pickled seed file (*.bin)", \
+  "(*.bin)|*.bin", g.getdir("app"))
+record_path = g.savedialog("Save the recording (*.rec)", \
+  "(*.rec)|*.rec", g.getdir("app"), "contest.rec")
+#
+# Load pickles and select a random seed from each pickle.
+#
+handle1 = open(path1, "rb") # rb = read binary
+pickle1 = pickle.load(handle1)
+handle1.close()
+seed1 = rand.choice(pickle1) # random seed from pickle1
+#
+handle2 = open(path2, "rb") # rb = read binary
+pickle2 = pickle.load(handle2)
+handle2.close()
+seed2 = rand.choice(pickle2) # random seed from pickle2
+#
+# Record the games with a headless engine. The rotations and
+# placements come from the same calls to the random number
+# generator as in score_pair().
+#
+g.show("Recording ...")
+start_time = time.time()
+recordings = mfunc.record_contest(seed1, seed2, mparam.width_factor, \
+  mparam.height_factor, mparam.time_factor, mparam.num_trials)
+seconds = time.time() - start_time
+#
+record_handle = open(record_path, "wb") # wb = write binary
+pickle.dump([path1, path2, recordings], record_handle, 2)
+record_handle.close()
+#
+g.note("Recorded " + str(len(recordings)) + " games in " + \
+  "{:.1f} seconds.\n\n".format(seconds) + \
+  "Red seed file:  " + path1 + "\n" + \
+  "Blue seed file: " + path2 + "\n" + \
+  "Recording: " + record_path + \
+  " ({} bytes)\n".format(os.path.getsize(record_path)))
+#
+#
@@ -14,10 +14,16 @@
 # Proceedings of the Third International Conference on Genetic 
 # Algorithms (ICGA-89), pp. 116-121. California: Morgan Kaufmann. 
 #
-import golly as g
+# Golly is only needed when simulation_engine is "golly"; with a
+# headless engine, the model also runs in a plain Python process
+try:
+  import golly as g
+except ImportError:
+  g = None
 import model_classes as mclass
 import model_functions as mfunc
 import model_parameters as mparam
+import model_engines as mengine
 import random as rand
 import copy
 import time
@@ -85,15 +91,16 @@ num_trials = mparam.num_trials
 message = "Building a history for initial population.\n"
 mfunc.show_message(g, log_handle, message)
 #
-# Every seed competes against every other seed (and itself)
+# Every seed competes against every other seed (and itself).
+# Since mfunc.update_history updates i's score for j and j's score for i,
+# we only need to calculate the lower triangle of the matrix of scores.
+# The headless engines play all of these games together.
+pairs = [[i, j] for i in range(pop_size) for j in range(i + 1)]
+mfunc.update_history_pairs(g, pop, pairs, width_factor, height_factor, \
+  time_factor, num_trials)
+# While we're here, let's update the similarities.
 for i in range(pop_size):
-  # Since mfunc.update_history updates i's score for j and j's score for i,
-  # we only need to calculate the lower triangle of the matrix of scores.
-  for j in range(i + 1):
-    mfunc.update_history(g, pop, i, j, width_factor, height_factor, \
-      time_factor, num_trials)
-    # While we're here, let's update the similarities.
-    mfunc.update_similarity(pop, i, j)
+  mfunc.update_similarities(pop, i)
 #
 # -----------------------------------------------------------------
 # Log the average population fitness for the initial population.
@@ -135,6 +142,9 @@ for n in range(run_length + 1):
     # Store the elite of the population for later analysis.
     mfunc.archive_elite(pop, elite_size, log_directory, \
       log_name, run_id_number)
+    # Report the accuracy and speed of approximate scoring.
+    if (mparam.early_stop):
+      mfunc.show_message(g, log_handle, mengine.early_stopper().report())
     #
   #
   # Calculate max_seed_area. The maximum seed area increases linearly 
@@ -219,6 +229,8 @@ for n in range(run_length + 1):
 avg_fit = mfunc.average_fitness(pop)
 message = "Average fitness of the final population: {:.3f}\n".format(avg_fit)
 mfunc.show_message(g, log_handle, message)
+if (mparam.early_stop):
+  mfunc.show_message(g, log_handle, mengine.early_stopper().report())
 #
 end_time = time.strftime("End time: 20%y-%m-%d %Hh:%Mm:%Ss\n", time.localtime())
 mfunc.show_message(g, log_handle, end_time)
@@ -0,0 +1,142 @@
+#
+# Test Model Classes
+#
+# Check the classes in model_classes.py. Run with pytest.
+#
+import model_classes as mclass
+import model_parameters as mparam
+import numpy as np
+import random as rand
+import pickle
+import copy
+#
+# random_population(pop_size) -- returns pop
+#
+def random_population(pop_size):
+  seeds = []
+  for i in range(pop_size):
+    seed = mclass.Seed(4, 4, pop_size)
+    seed.randomize(0.4)
+    seeds.append(seed)
+  return mclass.Population(seeds)
+#
+# random_score() -- returns score
+#
+def random_score():
+  """
+  A score that score_pair() could give: a whole number of half wins
+  out of num_trials games.
+  """
+  units = 2 * mparam.num_trials
+  return rand.randrange(units + 1) / float(units)
+#
+def test_population_fitness():
+  rand.seed(3)
+  pop_size = 12
+  pop = random_population(pop_size)
+  for n in range(400):
+    i = rand.randrange(pop_size)
+    if (n % 50 == 0):
+      # a new seed, as a child replaces the worst seed
+      old_seed = pop[i]
+      old_history = old_seed.history.copy()
+      child = mclass.Seed(4, 4, pop_size)
+      for j in range(pop_size):
+        child.history[j] = random_score()
+      pop[i] = child
+      assert pop[i] is child
+      assert child.address == i
+      # the old seed keeps its own history
+      pop.set_score(i, 0, random_score())
+      assert np.array_equal(old_seed.history, old_history)
+    j = rand.randrange(pop_size)
+    pop.set_score(i, j, random_score())
+    # the history of a seed is a view of its row of the matrix
+    assert pop[i].history[j] == pop.history[i][j]
+    assert np.array_equal(pop.fitness_vector(), \
+      [seed.fitness() for seed in pop])
+#
+# check_index(index, values) -- returns NULL
+#
+def check_index(index, values):
+  """
+  Check the choices of a selection index against a linear scan, with
+  ties going to the lowest index.
+  """
+  assert index.best_index() == int(np.argmax(values))
+  assert index.worst_index() == int(np.argmin(values))
+  order = [int(i) for i in np.argsort(-values, kind="mergesort")]
+  for k in [0, 1, 3, len(values), len(values) + 2]:
+    assert index.top(k) == order[:k]
+#
+def test_selection_index():
+  rng = np.random.RandomState(4)
+  for num_values in [1, 2, 5, 16, 33]:
+    # few distinct values, so there are many ties
+    values = rng.randint(0, 4, num_values) / 4.0
+    index = mclass.SelectionIndex(values)
+    for n in range(60):
+      check_index(index, values)
+      i = rng.randint(num_values)
+      values[i] = rng.randint(0, 4) / 4.0
+      index.update(i, values[i])
+    values = rng.randint(0, 4, num_values) / 4.0
+    index.rebuild(values)
+    check_index(index, values)
+#
+def test_population_selection():
+  rand.seed(6)
+  pop_size = 10
+  pop = random_population(pop_size)
+  for n in range(200):
+    pop.set_score(rand.randrange(pop_size), rand.randrange(pop_size), \
+      random_score())
+    fitness = pop.fitness_vector()
+    assert pop.best_address() == int(np.argmax(fitness))
+    assert pop.worst_address() == int(np.argmin(fitness))
+    assert pop.top_addresses(4) == \
+      [int(i) for i in np.argsort(-fitness, kind="mergesort")[:4]]
+#
+# same_seed(seed1, seed2) -- returns True or False
+#
+def same_seed(seed1, seed2):
+  return (seed1.xspan == seed2.xspan) and (seed1.yspan == seed2.yspan) and \
+    (seed1.address == seed2.address) and \
+    (seed1.cells.dtype == seed2.cells.dtype) and \
+    np.array_equal(seed1.cells, seed2.cells) and \
+    np.array_equal(seed1.history, seed2.history) and \
+    np.array_equal(seed1.similarities, seed2.similarities)
+#
+def test_seed_pickle():
+  rand.seed(8)
+  pop = random_population(6)
+  pop.set_score(2, 1, 1.0)
+  # a yspan that is not a multiple of 8 leaves padding bits
+  odd = mclass.Seed(3, 13, 6)
+  odd.randomize(0.5)
+  # a seed with state 2 is pickled without packing
+  blue = copy.deepcopy(odd)
+  blue.red2blue()
+  for seed in [pop[2], odd, blue]:
+    for protocol in [0, 2]:
+      loaded = pickle.loads(pickle.dumps(seed, protocol))
+      assert same_seed(loaded, seed)
+    assert same_seed(copy.deepcopy(seed), seed)
+  # binary seeds are stored packed
+  assert "packed_cells" in odd.__getstate__()
+  assert "cells" in blue.__getstate__()
+  # a pickle from before the cells were packed
+  state = odd.__dict__.copy()
+  old = mclass.Seed(1, 1, 1)
+  old.__setstate__(state)
+  assert same_seed(old, odd)
+#
+def test_pack_cells():
+  rng = np.random.RandomState(9)
+  for [xspan, yspan] in [[1, 1], [3, 8], [5, 13], [7, 30]]:
+    cells = rng.randint(0, 2, (xspan, yspan))
+    packed = mclass.pack_cells(cells)
+    assert packed.shape == (xspan, int((yspan + 7) / 8))
+    assert np.array_equal(mclass.unpack_cells(packed, yspan), cells)
+#
+#
@@ -0,0 +1,134 @@
+#
+# Test Model Engines
+#
+# Check the headless engines in model_engines.py against repeated
+# immigration_step() on random toroids: one board at a time with
+# run(), stacks of boards with run_batch(), and the cycle detection
+# and dead-colour checks of run_stack(). Run with pytest.
+#
+import model_engines as mengine
+import numpy as np
+import pytest
+#
+engine_names = sorted(mengine.engine_classes.keys())
+#
+# random_boards(rng, num_boards, g_width, g_height, density) -- returns boards
+#
+def random_boards(rng, num_boards, g_width, g_height, density):
+  """
+  Make a stack of random boards [b][x][y] in which about density of
+  the cells are alive, half of them red and half blue.
+  """
+  shape = (num_boards, g_width, g_height)
+  live = (rng.random_sample(shape) < density)
+  return (live * rng.randint(1, 3, shape)).astype(np.uint8)
+#
+# reference_run(board, num_steps) -- returns board
+#
+def reference_run(board, num_steps):
+  """
+  Run a board for num_steps generations, one immigration_step() at
+  a time.
+  """
+  for step in range(num_steps):
+    board = mengine.immigration_step(board)
+  return board
+#
+# colour_counts(board) -- returns [count1, count2]
+#
+def colour_counts(board):
+  return [int(np.sum(board == 1)), int(np.sum(board == 2))]
+#
+# make_engine(engine_name, cycle_window, extinction_interval) -- returns engine
+#
+def make_engine(engine_name, cycle_window, extinction_interval):
+  """
+  Make a new engine with the given checks. The tiled engine gets small
+  tiles, so that the boards have several tiles, some of which hang
+  over the edge of the toroid.
+  """
+  engine = mengine.engine_classes[engine_name]()
+  engine.cycle_window = cycle_window
+  engine.extinction_interval = extinction_interval
+  if (engine_name == "tiled"):
+    engine.tile_size = 5
+  return engine
+#
+# beacon(board, x, y, state) -- returns NULL
+#
+def beacon(board, x, y, state):
+  """
+  Put a beacon (period 2: 8 live cells in even generations and 6 in
+  odd ones) on a board, with its corner at [x][y].
+  """
+  board[x:(x + 2), y:(y + 2)] = state
+  board[(x + 2):(x + 4), (y + 2):(y + 4)] = state
+#
+@pytest.mark.parametrize("engine_name", engine_names)
+@pytest.mark.parametrize("cycle_window", [0, 32])
+def test_run(engine_name, cycle_window):
+  rng = np.random.RandomState(1)
+  # the 70-cell width needs two 64-bit words in the bitboard engine
+  for [g_width, g_height, num_steps] in [[7, 5, 30], [23, 11, 60], \
+    [70, 9, 45]]:
+    board = random_boards(rng, 1, g_width, g_height, 0.4)[0]
+    original = board.copy()
+    engine = make_engine(engine_name, cycle_window, 0)
+    engine.setrule("Immigration:T" + str(g_width) + "," + str(g_height))
+    engine.set_board(board)
+    engine.run(num_steps)
+    expected = reference_run(original, num_steps)
+    assert np.array_equal(engine.get_board(), expected)
+    assert engine.count_pops() == colour_counts(expected)
+    assert engine.getgen() == str(num_steps)
+    # the caller's board is left alone
+    assert np.array_equal(board, original)
+#
+@pytest.mark.parametrize("engine_name", engine_names)
+@pytest.mark.parametrize("cycle_window", [0, 32])
+@pytest.mark.parametrize("extinction_interval", [0, 8])
+def test_run_batch(engine_name, cycle_window, extinction_interval):
+  rng = np.random.RandomState(2)
+  for [num_boards, g_width, g_height, num_steps] in [[6, 12, 9, 80], \
+    [3, 66, 10, 40]]:
+    boards = random_boards(rng, num_boards, g_width, g_height, 0.35)
+    # a board with only red (for the Life stack) and an empty board
+    boards[0][boards[0] == 2] = 1
+    boards[1] = 0
+    original = boards.copy()
+    engine = make_engine(engine_name, cycle_window, extinction_interval)
+    counts = engine.run_batch(boards, num_steps)
+    expected = [colour_counts(reference_run(board, num_steps)) \
+      for board in original]
+    assert np.array_equal(np.asarray(counts), expected)
+    assert np.array_equal(boards, original)
+#
+@pytest.mark.parametrize("engine_name", engine_names)
+def test_run_stack_skips_cycles(engine_name):
+  # far more generations than could be run one at a time, so this only
+  # finishes if run_stack() skips ahead once the boards are in cycles
+  boards = np.zeros((3, 16, 14), dtype=np.uint8)
+  beacon(boards[0], 2, 2, 1) # red only: moved to the Life stack
+  beacon(boards[1], 1, 1, 1)
+  beacon(boards[1], 8, 7, 2)
+  boards[2, 3:5, 3:5] = 2 # a blue block
+  boards[2, 8, 2:5] = 1 # a red blinker
+  engine = make_engine(engine_name, 32, 8)
+  for [num_steps, beacon_cells] in [[10 ** 9, 8], [10 ** 9 + 1, 6]]:
+    counts = engine.run_batch(boards.copy(), num_steps)
+    assert np.array_equal(np.asarray(counts), [[beacon_cells, 0], \
+      [beacon_cells, beacon_cells], [3, 4]])
+#
+@pytest.mark.parametrize("engine_name", engine_names)
+def test_run_skips_cycles(engine_name):
+  board = np.zeros((16, 14), dtype=np.uint8)
+  beacon(board, 1, 1, 1)
+  beacon(board, 8, 7, 2)
+  engine = make_engine(engine_name, 32, 0)
+  engine.setrule("Immigration:T16,14")
+  engine.set_board(board)
+  engine.run(10 ** 9 + 1)
+  assert np.array_equal(engine.get_board(), reference_run(board, 1))
+  assert engine.getgen() == str(10 ** 9 + 1)
+#
+#
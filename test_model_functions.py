@@ -0,0 +1,78 @@
+#
+# Test Model Functions
+#
+# Check the functions in model_functions.py that do not need Golly:
+# the similarity matrix of a population, and recording a contest and
+# replaying it from a pickle, as record_contest.py and view_replay.py
+# do. Run with pytest.
+#
+import model_classes as mclass
+import model_functions as mfunc
+import model_engines as mengine
+import numpy as np
+import random as rand
+import pickle
+#
+# random_seed(xspan, yspan, pop_size, density) -- returns seed
+#
+def random_seed(xspan, yspan, pop_size, density):
+  seed = mclass.Seed(xspan, yspan, pop_size)
+  seed.randomize(density)
+  return seed
+#
+def test_recording_round_trip():
+  rand.seed(5)
+  seed1 = random_seed(5, 4, 2, 0.4)
+  seed2 = random_seed(3, 6, 2, 0.4)
+  recordings = mfunc.record_contest(seed1, seed2, 6.0, 3.0, 6.0, 2, "numpy")
+  # saved and loaded as in record_contest.py and view_replay.py
+  [path1, path2, recordings] = pickle.loads(pickle.dumps(["path1", \
+    "path2", recordings], 2))
+  assert len(recordings) == 2
+  for recording in recordings:
+    [g_width, g_height, g_time] = recording.game.size()
+    assert recording.num_generations() == g_time
+    # every generation, keyframe or not, is the board the game reached
+    board = recording.game.board()
+    for generation in range(g_time + 1):
+      assert np.array_equal(recording.board(generation), board)
+      assert recording.counts[generation] == \
+        [int(np.sum(board == 1)), int(np.sum(board == 2))]
+      board = mengine.immigration_step(board)
+    # the orientations turn the original seeds into the seeds in the game
+    for n in range(2):
+      [rotation, flip] = recording.orientations[n]
+      turned = np.rot90(recording.seed_cells[n], rotation)
+      if (flip == 1):
+        turned = np.flipud(turned)
+      assert np.array_equal(turned > 0, recording.game.seeds[n][0] > 0)
+#
+def test_update_similarities():
+  rand.seed(7)
+  pop_size = 9
+  # seeds of three shapes; similarity() is 0 between different shapes
+  shapes = [[4, 4], [4, 5], [5, 4]]
+  seeds = [random_seed(shapes[i % 3][0], shapes[i % 3][1], pop_size, 0.5) \
+    for i in range(pop_size)]
+  # a copy of another seed, so that some similarities are 1
+  seeds[3].cells = seeds[0].cells.copy()
+  pop = mclass.Population(seeds)
+  for i in range(pop_size):
+    pop.update_similarities(i)
+  for i in range(pop_size):
+    for j in range(pop_size):
+      if (i == j):
+        assert pop[i].similarities[j] == 1.0
+      else:
+        assert pop[i].similarities[j] == mfunc.similarity(pop[i], pop[j])
+  assert pop[0].similarities[3] == 1.0
+  # replace a seed and update only its row and column
+  child = random_seed(4, 5, pop_size, 0.5)
+  pop[4] = child
+  pop.update_similarities(4)
+  for j in range(pop_size):
+    if (j != 4):
+      assert pop.similarities[4][j] == mfunc.similarity(child, pop[j])
+      assert pop.similarities[j][4] == pop.similarities[4][j]
+#
+#
@@ -0,0 +1,195 @@
+#
+# Validate Engines
+#
+# Check that the headless engines in model_engines.py give exactly
+# the same results as Golly. Pairs of seeds are taken from the final
+# elite pickles of some runs, with random rotations and placements,
+# as in score_pair(). Golly plays each game one generation at a time,
+# recording the populations of red and blue after every generation
+# and the final board (the reference traces). Then every headless
+# engine replays the same games and the first generation where it
+# differs from Golly is reported, along with the speed of each engine.
+#
+import golly as g
+import model_functions as mfunc
+import model_parameters as mparam
+import model_engines as mengine
+import pickle
+import time
+import os
+#
+# -----------------------------
+# Get some input from the user.
+# -----------------------------
+#
+[pickle_dir, analysis_dir, sorted_pickle_names, \
+  smallest_pickle_size] = mfunc.choose_pickles(g)
+#
+# -----------------------------------------------------------------
+# Initialize some variables and print them to the output.
+# -----------------------------------------------------------------
+#
+# pickles
+#
+num_runs = len(sorted_pickle_names)
+final_num = smallest_pickle_size
+#
+# number of pairs of seeds to take from each run
+#
+pairs_per_run = 5
+#
+# analysis file and reference traces file
+#
+basename = os.path.basename(os.path.normpath(analysis_dir))
+analysis_path = analysis_dir + "/validate-engines-" + \
+  basename + ".txt"
+analysis_handle = open(analysis_path, "w", 0)
+trace_path = analysis_dir + "/validate-engines-" + \
+  basename + "-traces.bin"
+#
+# parameters from model_parameters.py
+#
+width_factor = mparam.width_factor
+height_factor = mparam.height_factor
+time_factor = mparam.time_factor
+num_trials = mparam.num_trials
+#
+mfunc.show_message(g, analysis_handle, "\n\nValidate Engines\n\n")
+#
+for i in range(num_runs):
+  message = sorted_pickle_names[i] + "\n"
+  mfunc.show_message(g, analysis_handle, message)
+#
+mfunc.show_message(g, analysis_handle, "\n")
+#
+mfunc.show_message(g, analysis_handle, "width_factor = " + \
+  str(width_factor) + "\n")
+mfunc.show_message(g, analysis_handle, "height_factor = " + \
+  str(height_factor) + "\n")
+mfunc.show_message(g, analysis_handle, "time_factor = " + \
+  str(time_factor) + "\n")
+mfunc.show_message(g, analysis_handle, "num_trials = " + \
+  str(num_trials) + "\n")
+mfunc.show_message(g, analysis_handle, "pairs_per_run = " + \
+  str(pairs_per_run) + "\n\n")
+mfunc.show_message(g, analysis_handle, "path = " + \
+  str(pickle_dir) + "\n\n")
+#
+# -----------------------------------------------------------------
+# Make the games: pairs of seeds from the final elite of each run,
+# each with num_trials random rotations and placements.
+# -----------------------------------------------------------------
+#
+games = []
+for run in range(num_runs):
+  pickle_name = sorted_pickle_names[run] # log-2018-11-19-15h-40m-05s
+  z_name = pickle_name + "-pickle-" + str(final_num) + ".bin"
+  z_path = pickle_dir + z_name
+  z_handle = open(z_path, "rb") # rb = read binary
+  z_sample = pickle.load(z_handle)
+  z_handle.close()
+  for k in range(min(pairs_per_run, len(z_sample) - 1)):
+    games.extend(mfunc.make_games(z_sample[k], z_sample[k + 1], \
+      width_factor, height_factor, time_factor, num_trials))
+#
+# number of cell steps (cells x generations) in all the games
+#
+total_steps = 0
+for game in games:
+  total_steps = total_steps + mfunc.game_steps(game)
+#
+mfunc.show_message(g, analysis_handle, "number of games = " + \
+  str(len(games)) + "\n")
+mfunc.show_message(g, analysis_handle, "number of cell steps = " + \
+  str(total_steps) + "\n\n")
+#
+# -----------------------------------------------------------------
+# Record the reference traces with Golly.
+# -----------------------------------------------------------------
+#
+traces = []
+for game in games:
+  traces.append(mfunc.trace_game(g, game, True))
+#
+trace_handle = open(trace_path, "wb") # wb = write binary
+pickle.dump([games, traces], trace_handle)
+trace_handle.close()
+#
+# time Golly on the same games, playing each game in one run
+#
+start_time = time.time()
+for game in games:
+  mfunc.trace_game(g, game, False)
+golly_seconds = time.time() - start_time
+#
+mfunc.show_message(g, analysis_handle, "golly: " + \
+  "{:.0f}".format(total_steps / max(golly_seconds, 1e-9)) + \
+  " cell steps per second\n\n")
+#
+# -----------------------------------------------------------------
+# Replay the games with each headless engine. There are three
+# tests: (1) one generation at a time, compared with every
+# generation of the reference trace, (2) all generations in one
+# run (with cycle detection), compared with the final counts and
+# board, and (3) all games together with play_games(), compared
+# with the final counts.
+# -----------------------------------------------------------------
+#
+for engine_name in sorted(mengine.engine_classes.keys()):
+  engine = mengine.get_engine(engine_name)
+  engine.early_stop = False # the games must be played exactly
+  mfunc.show_message(g, analysis_handle, engine_name + ":\n")
+  # (1) every generation
+  first_step = 0
+  num_divergent = 0
+  for case in range(len(games)):
+    step = mfunc.first_divergence(traces[case], \
+      mfunc.trace_game(engine, games[case], True))
+    if (step > 0):
+      num_divergent = num_divergent + 1
+      mfunc.show_message(g, analysis_handle, "  game " + str(case) + \
+        " first differs from golly at generation " + str(step) + "\n")
+      if (first_step == 0) or (step < first_step):
+        first_step = step
+  # (2) all generations in one run
+  num_final_divergent = 0
+  start_time = time.time()
+  for case in range(len(games)):
+    [ref_counts, ref_board] = traces[case]
+    step = mfunc.first_divergence([ref_counts[-1:], ref_board], \
+      mfunc.trace_game(engine, games[case], False))
+    if (step > 0):
+      num_final_divergent = num_final_divergent + 1
+  run_seconds = time.time() - start_time
+  # (3) all games together
+  num_batch_divergent = 0
+  start_time = time.time()
+  batch_counts = mengine.play_games(engine, games, mparam.max_batch_cells)
+  batch_seconds = time.time() - start_time
+  for case in range(len(games)):
+    [ref_counts, ref_board] = traces[case]
+    if (batch_counts[case] != ref_counts[-1]):
+      num_batch_divergent = num_batch_divergent + 1
+  # report
+  if (first_step == 0):
+    mfunc.show_message(g, analysis_handle, \
+      "  every generation agrees with golly\n")
+  else:
+    mfunc.show_message(g, analysis_handle, "  " + str(num_divergent) + \
+      " games differ; the earliest difference is at generation " + \
+      str(first_step) + "\n")
+  mfunc.show_message(g, analysis_handle, "  single runs: " + \
+    str(num_final_divergent) + " games differ at the end, " + \
+    "{:.0f}".format(total_steps / max(run_seconds, 1e-9)) + \
+    " cell steps per second\n")
+  mfunc.show_message(g, analysis_handle, "  play_games: " + \
+    str(num_batch_divergent) + " games differ at the end, " + \
+    "{:.0f}".format(total_steps / max(batch_seconds, 1e-9)) + \
+    " cell steps per second\n\n")
+#
+# Final message.
+#
+mfunc.show_message(g, analysis_handle, "\nAnalysis complete.\n")
+analysis_handle.close()
+#
+#
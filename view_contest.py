@@ -9,6 +9,7 @@ import golly as g
 import model_classes as mclass
 import model_functions as mfunc
 import model_parameters as mparam
+import model_engines as mengine
 import random as rand
 import time
 import pickle
@@ -53,6 +54,83 @@ width_factor = mparam.width_factor
 height_factor = mparam.height_factor
 time_factor = mparam.time_factor
 #
+# Batch mode: play many contests without showing them, and report
+# how often each side wins.
+#
+answer = g.getstring("Number of contests to play in batch mode\n" + \
+  "(0 = watch the contests one at a time):", "0", "View Contest")
+num_contests = int(answer) if answer.strip().isdigit() else 0
+#
+if (num_contests > 0):
+  # Each contest takes a random seed from each pickle and gives each
+  # seed a random rotation, flip and placement, starting from the
+  # seeds in the pickles (as one trial of score_pair() would).
+  games = []
+  orientations = []
+  gaps = []
+  for n in range(num_contests):
+    s1 = rand.choice(pickle1)
+    s2 = rand.choice(pickle2)
+    game = mfunc.make_games(s1, s2, width_factor, height_factor, \
+      time_factor, 1)[0]
+    [[cells1, g_xstart1, g_ystart1], [cells2, g_xstart2, g_ystart2]] = \
+      game.seeds
+    orientations.append([mfunc.find_orientation(s1.cells, cells1), \
+      mfunc.find_orientation(s2.cells, cells2)])
+    # distance between the nearest cells of the seeds, as in
+    # Game.solo_steps()
+    gaps.append(max(mengine.circle_gap(g_xstart1, cells1.shape[0], \
+      g_xstart2, cells2.shape[0], game.g_width), \
+      mengine.circle_gap(g_ystart1, cells1.shape[1], \
+      g_ystart2, cells2.shape[1], game.g_height)))
+    games.append(game)
+  # play all the games together with a headless engine
+  engine_name = mparam.simulation_engine
+  if (engine_name in ["golly", "auto"]):
+    engine_name = "numpy"
+  g.show("Playing " + str(num_contests) + " contests with the " + \
+    engine_name + " engine ...")
+  start_time = time.time()
+  counts = mengine.play_games(mengine.get_engine(engine_name), games, \
+    mparam.max_batch_cells)
+  seconds = time.time() - start_time
+  results = []
+  for [count1, count2] in counts:
+    if (count1 > count2):
+      results.append(1)
+    elif (count2 > count1):
+      results.append(2)
+    else:
+      results.append(0)
+  # rates with 95% confidence intervals, overall and broken down
+  report = "Red: " + path1 + "\nBlue: " + path2 + "\n\n" + \
+    "{} contests in {:.1f} seconds ({} engine)\n\n".format( \
+    num_contests, seconds, engine_name) + \
+    "Rates with 95% confidence intervals (Wilson):\n\n" + \
+    "all: " + mfunc.contest_rates(results) + "\n"
+  for [n, colour] in [[0, "red"], [1, "blue"]]:
+    report = report + "\nBy orientation of the " + colour + " seed:\n\n"
+    for rotation in range(4):
+      for flip in range(2):
+        members = [results[k] for k in range(num_contests) \
+          if (orientations[k][n] == [rotation, flip])]
+        report = report + "rotated {:3d}, ".format(90 * rotation) + \
+          ["not flipped", "flipped    "][flip] + ": " + \
+          mfunc.contest_rates(members) + "\n"
+  report = report + "\nBy distance between the seeds (in quarters):\n\n"
+  order = sorted(range(num_contests), key=lambda k: gaps[k])
+  for quarter in range(4):
+    members = order[int(quarter * num_contests / 4): \
+      int((quarter + 1) * num_contests / 4)]
+    if (len(members) == 0):
+      continue
+    report = report + "distance {:3d} to {:3d}: ".format( \
+      gaps[members[0]], gaps[members[-1]]) + \
+      mfunc.contest_rates([results[k] for k in members]) + "\n"
+  g.setclipstr(report) # so that the report can be pasted elsewhere
+  g.note(report + "\nThis report has been copied to the clipboard.")
+  g.exit()
+#
 # At the bottom of this loop, the user will be prompted to quit 
 # the loop, if desired.
 #
@@ -90,11 +168,13 @@ while True:
     "Blue seed size: {} x {}\n".format(seed2.xspan, seed2.yspan) + \
     "Blue seed density: {:.4f} ({} ones)\n\n".format(seed2.density(), \
       seed2.count_ones()) + \
+    "While the seeds compete, press space to pause or resume,\n" + \
+    "f to fast-forward to the end, or g to go to a generation.\n\n" + \
     "Select OK to begin the competition.\n")
   #
-  while (int(g.getgen()) < g_time):
-    g.run(1) # run for 1 step without displaying
-    g.update() # now display
+  # run in chunks of generations, showing mparam.playback_fps frames
+  # per second (see play_contest() for the keys)
+  mfunc.play_contest(g, g_time, mparam.playback_fps)
   #
   [count1, count2] = mfunc.count_pops(g) # see who won
   if (count1 > count2):
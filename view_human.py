@@ -91,11 +91,13 @@ while True:
     "Blue seed size: {} x {}\n".format(seed2.xspan, seed2.yspan) + \
     "Blue seed density: {:.4f} ({} ones)\n\n".format(seed2.density(), \
       seed2.count_ones()) + \
+    "While the seeds compete, press space to pause or resume,\n" + \
+    "f to fast-forward to the end, or g to go to a generation.\n\n" + \
     "Select OK to begin the competition.\n")
   #
-  while (int(g.getgen()) < g_time):
-    g.run(1) # run for 1 step without displaying
-    g.update() # now display
+  # run in chunks of generations, showing mparam.playback_fps frames
+  # per second (see play_contest() for the keys)
+  mfunc.play_contest(g, g_time, mparam.playback_fps)
   #
   [count1, count2] = mfunc.count_pops(g) # see who won
   if (count1 > count2):
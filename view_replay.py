@@ -0,0 +1,108 @@
+#
+# View Replay
+#
+# Replay the games recorded by record_contest.py, without playing
+# them again. Any generation can be shown at once (see Recording in
+# model_engines.py).
+#
+import golly as g
+import model_functions as mfunc
+import model_parameters as mparam
+import time
+import pickle
+import re
+import os
+#
+# Open a dialog window and ask the user to select a recording.
+#
+g.note("View Replay\n\n" + \
+  "You will be presented with a dialog menu:\n" + \
+  "     (1) Select a recording made by record_contest.py.\n" + \
+  "The recorded games will then be replayed, one after another.")
+#
+record_path = g.opendialog("Select a recording (*.rec)", \
+  "(*.rec)|*.rec", g.getdir("app"))
+#
+record_handle = open(record_path, "rb") # rb = read binary
+[path1, path2, recordings] = pickle.load(record_handle)
+record_handle.close()
+#
+[head1, tail1] = os.path.split(path1)
+[head2, tail2] = os.path.split(path2)
+g.show("Red: " + path1 + "    Blue: " + path2)
+#
+frame_seconds = 1.0 / mparam.playback_fps
+#
+for trial in range(len(recordings)):
+  recording = recordings[trial]
+  [g_width, g_height, g_time] = recording.game.size()
+  last = recording.num_generations()
+  # set up Golly
+  g.setalgo("QuickLife") # use the QuickLife algorithm
+  g.new("Immigration") # initialize cells to state 0
+  g.setrule("Immigration:T" + str(g_width) + "," + str(g_height)) # make a toroid
+  mfunc.show_board(g, recording.board(0))
+  g.setmag(mfunc.set_mag(g)) # set magnification
+  g.setcolors([0,255,255,255]) # set state 0 (the background) to white
+  g.update()
+  #
+  message = "Game " + str(trial + 1) + " of " + str(len(recordings)) + \
+    "\n\n"
+  names = ["Red seed (" + tail1 + ")", "Blue seed (" + tail2 + ")"]
+  for n in range(len(recording.game.seeds)):
+    [cells, g_xstart, g_ystart] = recording.game.seeds[n]
+    [rotation, flip] = recording.orientations[n]
+    message = message + names[n] + ":\n" + \
+      "  rotated {} degrees, ".format(90 * rotation) + \
+      ["not flipped", "flipped"][flip] + \
+      ", placed at ({}, {})\n".format(g_xstart, g_ystart)
+  g.note(message + "\n" + \
+    "Press space to pause or resume, left and right arrows to step\n" + \
+    "while paused, f to go to the end, or g to go to a generation.\n\n" + \
+    "Select OK to begin the replay.\n")
+  #
+  generation = 0
+  paused = False
+  while (generation < last) or paused:
+    start_time = time.time()
+    shown = generation
+    event = g.getevent()
+    if event.startswith("key"):
+      key = event.split()[1]
+      if (key == "space"):
+        paused = not paused
+      elif (key == "f"):
+        [generation, paused] = [last, False]
+      elif (key == "g"):
+        answer = g.getstring("Go to generation (0 to " + str(last) + \
+          "):", str(generation), "Go to generation")
+        if re.match(r"^\d+$", answer.strip()):
+          [generation, paused] = [min(int(answer), last), True]
+      elif (key == "right") and paused:
+        generation = min(generation + 1, last)
+      elif (key == "left") and paused:
+        generation = max(generation - 1, 0)
+    if (not paused) and (generation == shown) and (generation < last):
+      generation = generation + 1
+    if (generation != shown):
+      mfunc.show_board(g, recording.board(generation))
+      [count1, count2] = recording.counts[generation]
+      g.show("Generation " + str(generation) + " of " + str(last) + \
+        ".  Red: " + str(count1) + ".  Blue: " + str(count2) + \
+        ("  (paused)" if paused else ""))
+      g.update()
+    # wait for the rest of the frame
+    time.sleep(max(0.0, frame_seconds - (time.time() - start_time)))
+  #
+  [count1, count2] = recording.counts[last]
+  if (count1 > count2):
+    result = "Red won! Red: {}. Blue: {}.\n\n".format(count1, count2)
+  elif (count2 > count1):
+    result = "Blue won! Red: {}. Blue: {}.\n\n".format(count1, count2)
+  else:
+    result = "Tie! Red: {}. Blue: {}.\n\n".format(count1, count2)
+  #
+  g.note(result + "Select Cancel to end.\n" + \
+    "Select OK to go on to the next game.")
+#
+#